@@ -0,0 +1,49 @@
+"""
+as_dict against the __dict__ walk it replaced, on Article rows with their settings and authors loaded.
+"""
+import datetime
+
+from sqlalchemy.orm import joinedload
+
+from benchmarks.support import report, sqlite_session
+from ojssqla import ojs, logic
+
+
+def baseline_as_dict(obj):
+    # as_dict before the per-class serializers
+    x = {}
+    if not obj:
+        return x
+    valid_keys = filter(lambda k: not k.startswith('_'), obj.__dict__.keys())
+    for key in valid_keys:
+        val = getattr(obj, key)
+        if isinstance(val, list):
+            x[key] = [baseline_as_dict(row) for row in val]
+        else:
+            x[key] = val
+    return x
+
+
+def main(articles=10000, number=3):
+    session, counter = sqlite_session(('articles', 'article_settings', 'published_articles', 'issues', 'authors', 'article_galleys',
+                                       'taxonomy_article', 'edit_decisions', 'sections', 'article_files', 'taxonomy', 'issue_galleys'))
+    now = datetime.datetime(2020, 6, 1)
+    for article_id in xrange(1, articles + 1):
+        session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0, current_round=1,
+                                fast_tracked=0, hide_author=0, comments_status=0, date_submitted=now))
+        for setting_name in ('title', 'abstract'):
+            session.add(ojs.ArticleSetting(article_id=article_id, locale='en_US', setting_name=setting_name,
+                                           setting_value='%s %d' % (setting_name, article_id), setting_type='string'))
+        session.add(ojs.Author(author_id=article_id, submission_id=article_id, primary_contact=1, seq=1, first_name='First', last_name='Last',
+                               email='author@example.org'))
+    session.commit()
+
+    rows = session.query(ojs.Article).options(joinedload(ojs.Article.settings), joinedload(ojs.Article.authors)).all()
+    assert logic.all_as_dict(rows) == [baseline_as_dict(row) for row in rows]
+    for name, function in (('baseline', baseline_as_dict), ('as_dict', logic.as_dict)):
+        report('%s: %d articles' % (name, len(rows)), lambda: [function(row) for row in rows], counter, number)
+    report('as_dict depth=0: %d articles' % len(rows), lambda: [logic.as_dict(row, depth=0) for row in rows], counter, number)
+
+
+if __name__ == '__main__':
+    main()
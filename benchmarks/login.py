@@ -0,0 +1,54 @@
+"""
+failed and successful login latency, resolve_login against the three query lookup it replaced.
+"""
+import datetime
+
+from sqlalchemy.orm.exc import NoResultFound
+
+from benchmarks.support import report, sqlite_session
+from ojssqla import ojs, logic
+
+
+def baseline_login(session, username, password, unhashed_password):
+    # get_login_user before resolve_login
+    try:
+        return session.query(ojs.User).filter(ojs.User.username == username, ojs.User.password == password).one()
+    except NoResultFound:
+        try:
+            user = logic.get_user_from_email(session, username)
+            if user:
+                password = logic.hash_password(user.username, unhashed_password)
+                return session.query(ojs.User).filter(ojs.User.username == user.username, ojs.User.password == password).one()
+            else:
+                return None
+        except NoResultFound:
+            return None
+
+
+def main(users=1000, number=1000):
+    session, counter = sqlite_session(('users', 'roles', 'user_interests', 'controlled_vocab_entries'))
+    now = datetime.datetime(2020, 6, 1)
+    for user_id in xrange(1, users + 1):
+        username = 'user%d' % user_id
+        session.add(ojs.User(user_id=user_id, username=username, password=logic.hash_password(username, 'secret'), first_name='First',
+                             last_name='Last', email='%s@example.org' % username, date_registered=now, date_last_login=now,
+                             must_change_password=0, disabled=0, inline_help=0))
+        session.add(ojs.Roles(journal_id=1, user_id=user_id, role_id=16))
+    session.commit()
+
+    cases = [
+        ('username', 'user1', 'secret'),
+        ('email', 'user1@example.org', 'secret'),
+        ('wrong password', 'user1', 'guess'),
+        ('wrong password by email', 'user1@example.org', 'guess'),
+        ('unknown login', 'nobody@example.org', 'guess'),
+    ]
+    for name, function in (('baseline', baseline_login), ('resolve_login', logic.resolve_login)):
+        for case, login, password in cases:
+            hashed = logic.hash_password(login, password)
+            report('%s: %s' % (name, case), lambda: function(session, login, hashed, password), counter, number,
+                   setup=session.expunge_all)
+
+
+if __name__ == '__main__':
+    main()
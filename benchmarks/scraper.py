@@ -0,0 +1,53 @@
+"""
+query count and wall time of scraper.get_articles against the per-article queries it replaced.
+"""
+import datetime
+
+from benchmarks.support import report, sqlite_session
+from ojssqla import ojs, scraper
+
+
+def baseline_get_articles(session):
+    # get_articles before add_article_details
+    articles = scraper.all_as_dict(scraper.articles_query(session))
+    for article in articles:
+        article['events'] = scraper.get_article_events(session, article['article_id'])
+        article['settings'] = scraper.get_article_settings(session, article['article_id'])
+        article['published_article'] = scraper.get_published_article(session, article['article_id'])
+        article['latest_rejected_decission'] = scraper.get_editor_decissions(session, article['article_id'], 4)
+        article['latest_accepted_decission'] = scraper.get_editor_decissions(session, article['article_id'], 1)
+        article['authors'] = scraper.get_author_settings(session, article['authors'])
+    return articles
+
+
+def main(articles=1000, number=1):
+    session, counter = sqlite_session(('articles', 'article_settings', 'published_articles', 'issues', 'authors', 'author_settings',
+                                       'article_galleys', 'taxonomy_article', 'edit_decisions', 'sections', 'article_files', 'taxonomy',
+                                       'issue_galleys', 'event_log'))
+    now = datetime.datetime.now()
+    session.add(ojs.Section(section_id=1, journal_id=1, seq=1))
+    session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                          show_title=1, date_published=now, volume=1, number='1'))
+    for article_id in xrange(1, articles + 1):
+        session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0, current_round=1,
+                                fast_tracked=0, hide_author=0, comments_status=0, date_submitted=now))
+        session.add(ojs.ArticleSetting(article_id=article_id, locale='en_US', setting_name='title', setting_value='Article %d' % article_id,
+                                       setting_type='string'))
+        session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=1, seq=article_id, access_status=0,
+                                         date_published=now))
+        session.add(ojs.EditDecision(edit_decision_id=article_id, article_id=article_id, round=1, editor_id=1, decision=1, date_decided=now))
+        session.add(ojs.EventLog(log_id=article_id, assoc_type=257, assoc_id=article_id, user_id=1, date_logged=now, ip_address='127.0.0.1',
+                                 event_type=1))
+        session.add(ojs.Author(author_id=article_id, submission_id=article_id, primary_contact=1, seq=1, first_name='First', last_name='Last',
+                               email='author@example.org'))
+        session.add(ojs.AuthorSetting(author_id=article_id, locale='en_US', setting_name='affiliation', setting_value='University',
+                                      setting_type='string'))
+    session.commit()
+
+    for name, function in (('baseline', baseline_get_articles), ('get_articles', scraper.get_articles),
+                           ('get_modified_articles', scraper.get_modified_articles)):
+        report('%s: %d articles' % (name, articles), lambda: function(session), counter, number, setup=session.expunge_all)
+
+
+if __name__ == '__main__':
+    main()
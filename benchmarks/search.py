@@ -0,0 +1,42 @@
+"""
+query latency of search_articles and basic_search(use_index=True) over the search index. the match() side of
+basic_search needs MySQL's fulltext index, so it is skipped on sqlite.
+"""
+import datetime
+import random
+
+from benchmarks.support import report, sqlite_session
+from ojssqla import ojs, logic
+
+WORDS = ('climate', 'ocean', 'policy', 'health', 'network', 'learning', 'history', 'language', 'energy', 'urban', 'genome', 'market',
+         'education', 'migration', 'soil', 'protein', 'memory', 'justice', 'signal', 'forest')
+
+
+def main(articles=2000, number=20):
+    session, counter = sqlite_session(('articles', 'article_settings', 'published_articles', 'issues', 'authors', 'article_galleys',
+                                       'taxonomy_article', 'edit_decisions', 'sections', 'article_files', 'taxonomy', 'issue_galleys',
+                                       'ojssqla_search_terms', 'ojssqla_search_documents'))
+    words = random.Random(0)
+    now = datetime.datetime(2020, 6, 1)
+    session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                          show_title=1, date_published=now, volume=1, number='1'))
+    for article_id in xrange(1, articles + 1):
+        session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0, current_round=1,
+                                fast_tracked=0, hide_author=0, comments_status=0, date_submitted=now))
+        for setting_name, length in (('title', 6), ('abstract', 60)):
+            session.add(ojs.ArticleSetting(article_id=article_id, locale='en_US', setting_name=setting_name, setting_type='string',
+                                           setting_value=' '.join(words.choice(WORDS) for i in xrange(length))))
+        session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=1, seq=article_id, access_status=0,
+                                         date_published=now))
+    session.commit()
+    logic.rebuild_search_index(session)
+
+    for search_term in ('genome', 'ocean policy', 'climate energy urban'):
+        report('search_articles: %s' % search_term, lambda: logic.search_articles(session, search_term), counter, number)
+        report('basic_search index: %s' % search_term, lambda: logic.basic_search(session, search_term, use_index=True).all(), counter, number,
+               setup=session.expunge_all)
+    print('basic_search match(): skipped, needs a MySQL fulltext index')
+
+
+if __name__ == '__main__':
+    main()
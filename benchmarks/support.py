@@ -0,0 +1,37 @@
+"""
+timing helpers for the benchmarks. each benchmark module runs against an in-memory sqlite database built with
+tests.support, e.g. python -m benchmarks.login
+"""
+import timeit
+
+from sqlalchemy.orm import sessionmaker
+
+from tests.support import QueryCounter, sqlite_engine
+
+
+def sqlite_session(tables):
+    """
+    returns (session, QueryCounter) for a fresh in-memory database with the named tables.
+    """
+    engine = sqlite_engine(tables)
+    return sessionmaker(bind=engine)(), QueryCounter(engine)
+
+
+def report(name, function, counter, number=1000, setup=None):
+    """
+    runs function number times and prints the mean latency and the number of statements for one call.
+    """
+    if setup:
+        setup()
+    start = counter.count
+    function()
+    queries = counter.count - start
+
+    def run():
+        if setup:
+            setup()
+        function()
+
+    seconds = timeit.timeit(run, number=number)
+    print('%-40s %10.3f ms %6d queries' % (name, seconds * 1000.0 / number, queries))
+    return seconds / number
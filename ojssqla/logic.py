@@ -1,75 +1,1203 @@
 import ojs
+import atexit
+import base64
 import collections
+import copy
 import hashlib
-
-from sqlalchemy.orm import joinedload,subqueryload, contains_eager
-from sqlalchemy import desc, asc, func, and_, or_, extract
+import hmac
+import json
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+
+from itertools import izip
+from operator import itemgetter
+
+from sqlalchemy.orm import joinedload,subqueryload, contains_eager, selectinload, lazyload, noload, Session
+from sqlalchemy import desc, asc, func, and_, or_, inspect, case, event, false
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 from datetime import date, timedelta, datetime
 from phpserialize import *
 
+logger = logging.getLogger(__name__)
+
 #
 # utils
 #
 
-def as_dict(obj):
-        """
-        returns a dictionary instead of an object. probably quite expensive, but very convenient for caching.
-        """
-        x = {}
-        if not obj:
-                return x
-        valid_keys = filter(lambda k: not k.startswith('_'), obj.__dict__.keys())
-        for key in valid_keys:
-                val = getattr(obj, key)
-                if isinstance(val, list):
-                        x[key] = [as_dict(row) for row in val]
+_serializers = {}
+
+def _compile_serializer(cls, fields=None):
+    """
+    builds a serializer for a mapped class from its mapper. column and relationship keys are resolved once here
+    rather than by filtering obj.__dict__ for every row.
+    """
+    mapper = inspect(cls, raiseerr=False)
+    if mapper is None or not hasattr(mapper, 'column_attrs'):
+        return None
+
+    column_keys = tuple(attr.key for attr in mapper.column_attrs if not fields or attr.key in fields)
+    relationships = tuple((rel.key, rel.uselist) for rel in mapper.relationships if not fields or rel.key in fields)
+    if len(column_keys) > 1:
+        get_columns = itemgetter(*column_keys)
+    elif column_keys:
+        get_columns = lambda d: (d[column_keys[0]],)
+    else:
+        get_columns = lambda d: ()
+
+    def serialize(obj, depth=None):
+        state = obj.__dict__
+        try:
+            x = dict(izip(column_keys, get_columns(state)))
+        except KeyError:
+            # expired or deferred columns are left out, as the old __dict__ walk did.
+            x = dict((key, state[key]) for key in column_keys if key in state)
+
+        if depth == 0:
+            return x
+        child_depth = None if depth is None else depth - 1
+        for key, uselist in relationships:
+            # only relationships that are already loaded, never trigger a lazy load here.
+            if key in state:
+                val = state[key]
+                if uselist and val is not None:
+                    x[key] = [as_dict(row, depth=child_depth) for row in val]
                 else:
-                        x[key] = val
+                    x[key] = val
         return x
 
-def all_as_dict(obj_list):
-        return [as_dict(obj) for obj in obj_list]
+    return serialize
 
+def get_serializer(cls, fields=None):
+    """
+    returns the cached serializer for a mapped class, or None if the class isn't mapped.
+    """
+    key = (cls, fields)
+    try:
+        return _serializers[key]
+    except KeyError:
+        serializer = _serializers[key] = _compile_serializer(cls, fields)
+        return serializer
+
+def _as_dict_generic(obj, depth=None):
+    x = {}
+    for key, val in obj.__dict__.iteritems():
+        if key.startswith('_'):
+            continue
+        if isinstance(val, list):
+            if depth != 0:
+                x[key] = [as_dict(row, depth=None if depth is None else depth - 1) for row in val]
+        else:
+            x[key] = val
+    return x
+
+def as_dict(obj, depth=None, fields=None):
+    """
+    returns a dictionary instead of an object, very convenient for caching.
 
-def dict_ojs_settings_results(settings_results, locales=None):
+    depth limits how many levels of loaded relationships are serialized (None for all of them) and fields
+    restricts the top level to the given attribute names.
+    """
+    if not obj:
+        return {}
+    if fields is not None:
+        fields = frozenset(fields)
+    serializer = get_serializer(type(obj), fields)
+    if serializer is None:
+        x = _as_dict_generic(obj, depth)
+        if fields is not None:
+            x = dict((key, val) for key, val in x.iteritems() if key in fields)
+        return x
+    return serializer(obj, depth)
+
+def all_as_dict(obj_list, depth=None, fields=None):
+    return [as_dict(obj, depth=depth, fields=fields) for obj in obj_list]
+
+
+#
+# settings resolution
+#
+
+SETTINGS_OWNER_KEYS = {
+    ojs.ArticleSetting: 'article_id',
+    ojs.AuthorSetting: 'author_id',
+    ojs.UserSetting: 'user_id',
+    ojs.IssueSettings: 'issue_id',
+    ojs.SectionSettings: 'section_id',
+    ojs.JournalSetting: 'journal_id',
+}
+
+# the locales cached pages are resolved for when the caller doesn't name any.
+DEFAULT_LOCALES = ('en_US',)
+
+_setting_keys = {}
+
+def normalize_setting_name(setting_name):
+    """
+    'pub-id::doi' -> 'pub_id_doi'. normalised names are computed once and interned.
+    """
+    try:
+        return _setting_keys[setting_name]
+    except KeyError:
+        key = setting_name.replace('-', '_').replace('::', '_')
+        try:
+            key = intern(str(key))
+        except UnicodeEncodeError:
+            pass
+        _setting_keys[setting_name] = key
+        return key
+
+def settings_locale_priority(locales):
+    """
+    returns {locale: rank} for the requested locales followed by the non localised '' locale.
+    the caller's list is left untouched.
+    """
+    priority = {}
+    for locale in list(locales) + ['']:
+        priority.setdefault(locale, len(priority))
+    return priority
+
+def _resolve_setting(results_dict, ranks, key, value, rank):
+    # a lower rank wins, unless it only holds an empty value and the new one doesn't.
+    current = ranks.get(key)
+    if current is None:
+        results_dict[key], ranks[key] = value, rank
+        return
+    current_empty = not results_dict[key]
+    if (rank < current and (value or current_empty)) or (current_empty and value):
+        results_dict[key], ranks[key] = value, rank
+
+def _setting_value(row, decode_doi):
+    if decode_doi and row.setting_type == 'object' and row.setting_name == 'pub-id::doi':
+        return loads(row.setting_value).get('en_US')
+    return row.setting_value
+
+def resolve_settings(settings_results, locales=None, decode_doi=True):
+    """
+    turns settings rows for one owner into a dict in a single pass.
+
+    without locales the last row for a setting name wins. with locales the value from the first locale in the
+    list that has a non empty value wins, with '' (non localised settings) tried last.
+    """
     results_dict = {}
-    if locales:
-        results_dict = dict_ojs_settings_results_localised(settings_results, locales)
-    else:
+    if not locales:
         for row in settings_results:
-            if row.setting_type == 'object' and row.setting_name == 'pub-id::doi':
-                results_dict[row.setting_name.replace('-', '_').replace('::', '_')] = loads(row.setting_value).get('en_US')
-            else:
-                results_dict[row.setting_name.replace('-', '_').replace('::', '_')] = row.setting_value
+            results_dict[normalize_setting_name(row.setting_name)] = _setting_value(row, decode_doi)
+        return results_dict
 
+    priority = settings_locale_priority(locales)
+    ranks = {}
+    for row in settings_results:
+        rank = priority.get(row.locale)
+        if rank is not None:
+            _resolve_setting(results_dict, ranks, normalize_setting_name(row.setting_name), row.setting_value, rank)
     return results_dict
 
-def dict_ojs_settings_results_localised(settings_results, locales):
-    locales.append('') #ensures that non localised settings are also being pulled.
-    results_dict = {}
-    # get the settings that have the user language
+def resolve_settings_by_owner(settings_results, owner_key, locales=None, decode_doi=True):
+    """
+    the same as resolve_settings, but for rows belonging to many owners at once. returns {owner_id: settings dict}.
+    """
+    owners = collections.defaultdict(dict)
+    if not locales:
+        for row in settings_results:
+            owners[getattr(row, owner_key)][normalize_setting_name(row.setting_name)] = _setting_value(row, decode_doi)
+        return owners
+
+    priority = settings_locale_priority(locales)
+    owner_ranks = collections.defaultdict(dict)
     for row in settings_results:
-        if row.locale == locales[0]:
-            results_dict[row.setting_name.replace('-', '_').replace('::', '_')] = row.setting_value
+        rank = priority.get(row.locale)
+        if rank is not None:
+            owner_id = getattr(row, owner_key)
+            _resolve_setting(owners[owner_id], owner_ranks[owner_id], normalize_setting_name(row.setting_name), row.setting_value, rank)
+    return owners
 
-    #find any missing settings on the previous language and try with the default language
-    for locale in locales:
-        for row in settings_results:
-            if row.locale == locale:
-                try :
-                    if results_dict[row.setting_name.replace('-', '_').replace('::', '_')] == None or len(results_dict[row.setting_name.replace('-', '_').replace('::', '_')]) <1:
-                        results_dict[row.setting_name.replace('-', '_').replace('::', '_')] = row.setting_value
-                except KeyError:
-                    results_dict[row.setting_name.replace('-', '_').replace('::', '_')] = row.setting_value
+def get_settings_for_owners(session, settings_class, owner_ids, locales=None, setting_names=None, decode_doi=True):
+    """
+    fetches and resolves the settings of many owners with one query, e.g. the settings for every article of a
+    journal grouped by article_id. settings_class is one of the models in SETTINGS_OWNER_KEYS.
+    """
+    owner_key = SETTINGS_OWNER_KEYS[settings_class]
+    owner_column = getattr(settings_class, owner_key)
+    owner_ids = list(owner_ids)
+    if not owner_ids:
+        return collections.defaultdict(dict)
+
+    filters = [owner_column.in_(owner_ids)]
+    if setting_names:
+        filters.append(settings_class.setting_name.in_(setting_names))
+    if locales:
+        filters.append(settings_class.locale.in_(settings_locale_priority(locales).keys()))
 
-    return results_dict
+    rows = session.query(
+        owner_column,
+        settings_class.locale,
+        settings_class.setting_name,
+        settings_class.setting_value,
+        settings_class.setting_type,
+    ).filter(*filters)
+
+    return resolve_settings_by_owner(rows, owner_key, locales, decode_doi)
+
+def dict_ojs_settings_results(settings_results, locales=None):
+    return resolve_settings(settings_results, locales)
+
+def dict_ojs_settings_results_localised(settings_results, locales):
+    return resolve_settings(settings_results, locales)
+
+#
+# loading profiles
+#
+
+LOADER_STRATEGIES = {
+    'joined': joinedload,
+    'selectin': selectinload,
+    'subquery': subqueryload,
+    'lazy': lazyload,
+    'noload': noload,
+}
+
+# How each Article relationship is loaded per profile, overriding the
+# mapper's defaults (subquery for the collections, joined for
+# published_article). 'lazy' loads on first access, 'noload' never loads.
+# 'listing' eagerly loads only what article lists show, 'detail' and
+# 'export' load at least as much.
+ARTICLE_LOADING_PROFILES = {
+    'listing': {
+        'published_article': 'joined',
+        'settings': 'selectin',
+        'authors': 'selectin',
+        'galleys': 'selectin',
+        'taxonomies': 'lazy',
+        'decisions': 'lazy',
+    },
+    'detail': {
+        'published_article': 'joined',
+        'settings': 'selectin',
+        'authors': 'selectin',
+        'galleys': 'selectin',
+        'taxonomies': 'selectin',
+        'decisions': 'lazy',
+    },
+    'export': {
+        'published_article': 'joined',
+        'settings': 'selectin',
+        'authors': 'selectin',
+        'galleys': 'selectin',
+        'taxonomies': 'selectin',
+        'decisions': 'selectin',
+    },
+}
+
+def article_loading_options(profile):
+    """
+    returns the query options for a profile in ARTICLE_LOADING_PROFILES, e.g. query.options(*article_loading_options('listing')).
+    """
+    return [LOADER_STRATEGIES[strategy](getattr(ojs.Article, relationship)) for relationship, strategy in ARTICLE_LOADING_PROFILES[profile].iteritems()]
+
+def with_article_profile(query, profile):
+    return query.options(*article_loading_options(profile))
+
+#
+# published article index
+#
+
+PUBLISHED_ARTICLE_INDEX_SETTINGS = ('title', 'pub-id::doi', 'pub-id::publisher-id')
+
+_index_tables = {}
+
+def _index_table_exists(session, model):
+    # the ojssqla_* tables are optional, so maintenance is skipped on databases that don't have them.
+    key = (_database_key(session), model.__tablename__)
+    try:
+        return _index_tables[key]
+    except KeyError:
+        exists = _index_tables[key] = session.get_bind().dialect.has_table(session.connection(), model.__tablename__)
+        return exists
+
+def _create_index_tables(engine, *models):
+    for model in models:
+        model.__table__.create(engine, checkfirst=True)
+        _index_tables.pop((str(engine.url), model.__tablename__), None)
+
+def create_published_article_index(engine):
+    _create_index_tables(engine, ojs.PublishedArticleIndex)
+
+def published_article_index_rows(session, article_ids=None):
+    """
+    builds the ojssqla_published_article_index rows for the given articles (all published articles by default).
+    """
+    filters = [ojs.PublishedArticle.date_published != None]
+    if article_ids is not None:
+        filters.append(ojs.PublishedArticle.article_id.in_(article_ids))
+
+    published = session.query(
+        ojs.Article.article_id,
+        ojs.Article.section_id,
+        ojs.Article.journal_id,
+        ojs.PublishedArticle.published_article_id,
+        ojs.PublishedArticle.issue_id,
+        ojs.PublishedArticle.seq,
+        ojs.PublishedArticle.date_published,
+        ojs.PublishedArticle.access_status,
+        ojs.Section.seq.label('section_seq'),
+        ojs.Issue.volume,
+        ojs.Issue.number,
+        ojs.Issue.date_published.label('issue_date_published'),
+        ojs.Issue.access_status.label('issue_access_status'),
+        ojs.Issue.open_access_date,
+    ).join(
+        ojs.PublishedArticle, ojs.PublishedArticle.article_id == ojs.Article.article_id
+    ).join(
+        ojs.Issue, ojs.Issue.issue_id == ojs.PublishedArticle.issue_id
+    ).outerjoin(
+        ojs.Section, ojs.Section.section_id == ojs.Article.section_id
+    ).filter(*filters).all()
+
+    ids = [row.article_id for row in published]
+    identifiers = get_settings_for_owners(session, ojs.ArticleSetting, ids, setting_names=['pub-id::doi', 'pub-id::publisher-id'])
+    titles = get_settings_for_owners(session, ojs.ArticleSetting, ids, locales=['en_US'], setting_names=['title'])
+
+    return [{
+        'article_id': row.article_id,
+        'published_article_id': row.published_article_id,
+        'issue_id': row.issue_id,
+        'section_id': row.section_id,
+        'journal_id': row.journal_id,
+        'doi': identifiers[row.article_id].get('pub_id_doi'),
+        'publisher_id': identifiers[row.article_id].get('pub_id_publisher_id'),
+        'title': titles[row.article_id].get('title'),
+        'section_seq': row.section_seq,
+        'seq': row.seq,
+        'issue_volume': row.volume,
+        'issue_number': row.number,
+        'date_published': row.date_published,
+        'issue_date_published': row.issue_date_published,
+        'access_status': row.access_status,
+        'issue_access_status': row.issue_access_status,
+        'issue_open_access_date': row.open_access_date,
+    } for row in published]
+
+def refresh_published_article_index(session, article_ids):
+    """
+    rewrites the index rows of the given articles from the OJS tables. a no-op when the index table doesn't exist.
+    """
+    article_ids = list(article_ids)
+    if not article_ids or not _index_table_exists(session, ojs.PublishedArticleIndex):
+        return
+    session.query(ojs.PublishedArticleIndex).filter(ojs.PublishedArticleIndex.article_id.in_(article_ids)).delete(synchronize_session=False)
+    session.bulk_insert_mappings(ojs.PublishedArticleIndex, published_article_index_rows(session, article_ids))
+    session.flush()
+    article_count_cache.invalidate()
+
+def rebuild_published_article_index(session, chunk_size=1000):
+    """
+    (re)builds the whole index, creating the table if needed. run this after articles are published in OJS.
+    """
+    create_published_article_index(session.get_bind())
+    session.query(ojs.PublishedArticleIndex).delete(synchronize_session=False)
+    article_ids = [row.article_id for row in session.query(ojs.PublishedArticle.article_id).filter(ojs.PublishedArticle.date_published != None)]
+    for start in xrange(0, len(article_ids), chunk_size):
+        session.bulk_insert_mappings(ojs.PublishedArticleIndex, published_article_index_rows(session, article_ids[start:start + chunk_size]))
+    session.commit()
+    article_count_cache.invalidate()
+    invalidate_article_identifiers(session)
+    invalidate_issue_archive(session)
+    invalidate_issue_toc(session)
+    return len(article_ids)
+
+def indexed_articles(session, profile='listing'):
+    """
+    Article query joined to the index, filtered to articles in published issues.
+    """
+    return with_article_profile(session.query(ojs.Article), profile).join(
+        ojs.PublishedArticleIndex, ojs.PublishedArticleIndex.article_id == ojs.Article.article_id
+    ).filter(
+        ojs.PublishedArticleIndex.issue_date_published != None
+    )
+
+#
+# journal settings cache
+#
+
+ALL_LOCALES = '*'
+
+JournalSettingRow = collections.namedtuple('JournalSettingRow', ['journal_id', 'locale', 'setting_name', 'setting_value', 'setting_type'])
+JournalSettingValue = collections.namedtuple('JournalSettingValue', ['setting_value'])
+
+
+class JournalSettingsEntry(object):
+    """
+    the journal_settings rows for one (journal_id, locale), indexed by setting name. phpserialize'd values are
+    decoded on first use and kept, each caller gets its own copy.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.by_name = {}
+        self.unserialized = {}
+        for row in rows:
+            self.by_name.setdefault(row.setting_name, []).append(row)
+
+    def get(self, setting_name):
+        return self.by_name.get(setting_name, [])
+
+    def get_unserialized(self, setting_name):
+        try:
+            value = self.unserialized[setting_name]
+        except KeyError:
+            rows = self.get(setting_name)
+            if len(rows) > 1:
+                raise MultipleResultsFound('Multiple rows were found for %s' % setting_name)
+            value = loads(rows[0].setting_value, array_hook=collections.OrderedDict) if rows else None
+            self.unserialized[setting_name] = value
+        return copy.deepcopy(value)
+
+
+class TTLCache(object):
+    """
+    a process local, thread safe LRU cache whose entries also expire after ttl seconds.
+    """
+
+    def __init__(self, maxsize=128, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, loader):
+        now = time.time()
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is not None:
+                if now - item[0] < self.ttl:
+                    self._entries[key] = item
+                    self.hits += 1
+                    return item[1]
+                self.expirations += 1
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (now, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, match=None):
+        """
+        drops every entry, or only those whose key match(key) is true for.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if match is None or match(key)]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+journal_settings_cache = TTLCache()
+article_count_cache = TTLCache(maxsize=256, ttl=60)
+
+def _database_key(session):
+    # each journal lives in its own database, so cached entries are kept per connection url.
+    return str(session.get_bind().url)
+
+def load_journal_settings(session, journal_id=None, locale=ALL_LOCALES):
+    filters = []
+    if journal_id is not None:
+        filters.append(ojs.JournalSetting.journal_id == journal_id)
+    if locale != ALL_LOCALES:
+        filters.append(ojs.JournalSetting.locale == locale)
+
+    rows = session.query(
+        ojs.JournalSetting.journal_id,
+        ojs.JournalSetting.locale,
+        ojs.JournalSetting.setting_name,
+        ojs.JournalSetting.setting_value,
+        ojs.JournalSetting.setting_type,
+    ).filter(*filters)
+    return JournalSettingsEntry([JournalSettingRow(*row) for row in rows])
+
+def get_cached_journal_settings(session, journal_id=None, locale=ALL_LOCALES):
+    """
+    returns the JournalSettingsEntry for (journal_id, locale), loading it with a single query on a miss.
+    journal_id None covers every journal in the database, locale ALL_LOCALES every locale.
+    """
+    key = (_database_key(session), journal_id, locale)
+    return journal_settings_cache.get(key, lambda: load_journal_settings(session, journal_id, locale))
+
+def invalidate_journal_settings(session, journal_id=None):
+    """
+    drops the cached settings of a journal (and the entries spanning all journals) for this database.
+    """
+    database_key = _database_key(session)
+    return journal_settings_cache.invalidate(lambda key: key[0] == database_key and (journal_id is None or key[1] in (None, journal_id)))
+
+def after_transaction(session, callback):
+    """
+    calls callback() once the session's transaction has committed or rolled back. writers drop their cache
+    entries this way, so no other thread can cache the old value again before the commit, and nothing cached
+    during the transaction outlives a rollback.
+    """
+    session.info.setdefault('ojssqla_after_transaction', []).append(callback)
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _run_after_transaction(session):
+    for callback in session.info.pop('ojssqla_after_transaction', ()):
+        callback()
 
 def deltadate(days, start_date=None):
     rdate = (start_date or date.today()) - timedelta(days)
     return rdate.strftime('%Y-%m-%d')
 
+#
+# article identifiers
+#
+
+IDENTIFIER_SETTINGS = {
+    'pub-id::doi': 'doi',
+    'pub-id::publisher-id': 'publisher-id',
+}
+
+ArticleIdentifier = collections.namedtuple('ArticleIdentifier', ['article_id', 'article_published', 'issue_published'])
+
+article_identifier_cache = TTLCache(maxsize=32, ttl=300)
+
+def load_article_identifiers(session):
+    """
+    maps ('doi', value), ('publisher-id', value) and ('id', article_id) to an ArticleIdentifier for every article
+    that is published or in a published issue, see published_articles_filter, in one query. the first article wins
+    when an identifier is shared. DOIs and publisher ids are compared lower cased, as MySQL's collation compares them.
+    """
+    rows = session.query(
+        ojs.PublishedArticle.article_id,
+        ojs.PublishedArticle.date_published,
+        ojs.Issue.date_published,
+        ojs.ArticleSetting.setting_name,
+        ojs.ArticleSetting.setting_value,
+    ).outerjoin(
+        ojs.Issue, ojs.Issue.issue_id == ojs.PublishedArticle.issue_id
+    ).outerjoin(
+        ojs.ArticleSetting, and_(ojs.ArticleSetting.article_id == ojs.PublishedArticle.article_id, ojs.ArticleSetting.setting_name.in_(IDENTIFIER_SETTINGS.keys()))
+    ).filter(
+        or_(published_articles_filter(True), published_articles_filter(False))
+    ).order_by(ojs.PublishedArticle.article_id)
+
+    identifiers = {}
+    for article_id, article_date_published, issue_date_published, setting_name, setting_value in rows:
+        identifier = ArticleIdentifier(article_id, article_date_published is not None, issue_date_published is not None)
+        identifiers.setdefault(('id', article_id), identifier)
+        if setting_name is not None and setting_value:
+            identifiers.setdefault(_identifier_key(IDENTIFIER_SETTINGS[setting_name], setting_value), identifier)
+    return identifiers
+
+def get_article_identifiers(session):
+    return article_identifier_cache.get(_database_key(session), lambda: load_article_identifiers(session))
+
+def invalidate_article_identifiers(session):
+    database_key = _database_key(session)
+    return article_identifier_cache.invalidate(lambda key: key == database_key)
+
+def _identifier_key(kind, identifier):
+    if kind == 'id':
+        try:
+            return ('id', int(identifier))
+        except (TypeError, ValueError):
+            return None
+    if not isinstance(identifier, basestring):
+        identifier = str(identifier)
+    return (kind, identifier.lower())
+
+def published_articles_filter(issue_published=True):
+    """
+    the rules the article getters have always applied: get_article and get_article_by_id want the article's issue
+    published, the search getters (issue_published False) the published article's own date_published. needs
+    PublishedArticle, and Issue for issue_published, joined.
+    """
+    if issue_published:
+        return ojs.Issue.date_published != None
+    return ojs.PublishedArticle.date_published != None
+
+def query_article_identifiers(session, identifiers, kinds=('doi', 'publisher-id', 'id'), issue_published=True):
+    """
+    resolves identifiers against the database rather than the cached map, with one query per kind. used for the
+    identifiers the map doesn't know, e.g. articles OJS published after the map was loaded.
+    """
+    setting_names = dict((kind, setting_name) for setting_name, kind in IDENTIFIER_SETTINGS.iteritems())
+    resolved = {}
+    for kind in kinds:
+        wanted = collections.defaultdict(list)
+        for identifier in identifiers:
+            key = _identifier_key(kind, identifier)
+            if key is not None and identifier not in resolved:
+                wanted[key[1]].append(identifier)
+        if not wanted:
+            continue
+
+        query = session.query(ojs.PublishedArticle.article_id).outerjoin(
+            ojs.Issue, ojs.Issue.issue_id == ojs.PublishedArticle.issue_id
+        ).filter(
+            published_articles_filter(issue_published)
+        ).order_by(ojs.PublishedArticle.article_id)
+        if kind == 'id':
+            rows = ((article_id, article_id) for article_id, in query.filter(ojs.PublishedArticle.article_id.in_(wanted.keys())))
+        else:
+            rows = query.add_columns(ojs.ArticleSetting.setting_value).join(
+                ojs.ArticleSetting, ojs.ArticleSetting.article_id == ojs.PublishedArticle.article_id
+            ).filter(
+                ojs.ArticleSetting.setting_name == setting_names[kind],
+                func.lower(ojs.ArticleSetting.setting_value).in_(wanted.keys())
+            )
+        for article_id, value in rows:
+            for identifier in wanted.get(_identifier_key(kind, value)[1], ()):
+                resolved.setdefault(identifier, article_id)
+    return resolved
+
+def resolve_article_identifiers(session, identifiers, kinds=('doi', 'publisher-id', 'id'), issue_published=True):
+    """
+    resolves each identifier to an article_id, trying kinds in order. identifiers that don't resolve are left out.
+    issue_published picks the rule the article must meet, see published_articles_filter.
+
+    identifiers missing from the cached map are looked up with query_article_identifiers, and a hit there drops
+    the map so it's reloaded with the new article.
+    """
+    known = get_article_identifiers(session)
+    resolved = {}
+    for identifier in identifiers:
+        for kind in kinds:
+            found = known.get(_identifier_key(kind, identifier))
+            if found is not None and (found.issue_published if issue_published else found.article_published):
+                resolved[identifier] = found.article_id
+                break
+
+    missing = [identifier for identifier in identifiers if identifier not in resolved]
+    if missing:
+        queried = query_article_identifiers(session, missing, kinds, issue_published)
+        if queried:
+            invalidate_article_identifiers(session)
+            resolved.update(queried)
+    return resolved
+
+def resolve_article_identifier(session, identifier, kinds=('doi', 'publisher-id', 'id'), issue_published=True):
+    return resolve_article_identifiers(session, [identifier], kinds, issue_published).get(identifier)
+
+#
+# full text search
+#
+
+# article setting -> (field, weight). authors are indexed as the 'authors' field.
+SEARCH_SETTINGS = {
+    'title': ('title', 3),
+    'subject': ('keywords', 2),
+    'abstract': ('abstract', 1),
+}
+SEARCH_FIELD_WEIGHTS = dict(SEARCH_SETTINGS.values() + [('authors', 2)])
+
+SEARCH_STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'of', 'on', 'or',
+    'that', 'the', 'this', 'to', 'was', 'were', 'with',
+))
+
+_search_tags = re.compile(r'<[^>]+>')
+_search_words = re.compile(r'\w+', re.UNICODE)
+
+search_stats_cache = TTLCache(maxsize=32, ttl=300)
+
+def normalize_term(text):
+    """
+    lower cased, NFKD decomposed and without accents, so terms are unique the way MySQL's case and accent
+    insensitive collation compares them (u'R\xe9sum\xe9' and 'resume' are the same term).
+    """
+    return u''.join(char for char in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(char))
+
+def tokenize(text):
+    if not text:
+        return []
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'replace')
+    words = _search_words.findall(normalize_term(_search_tags.sub(' ', text)))
+    return [word[:60] for word in words if len(word) > 1 and word not in SEARCH_STOPWORDS]
+
+def search_index_rows(session, article_ids):
+    """
+    builds the (terms, documents) rows of the search index for the given articles, skipping unpublished ones.
+    """
+    published_ids = [row.article_id for row in session.query(ojs.PublishedArticle.article_id).filter(ojs.PublishedArticle.article_id.in_(article_ids), ojs.PublishedArticle.date_published != None)]
+    if not published_ids:
+        return [], []
+
+    frequencies = collections.defaultdict(collections.Counter)
+    settings = session.query(
+        ojs.ArticleSetting.article_id,
+        ojs.ArticleSetting.setting_name,
+        ojs.ArticleSetting.setting_value,
+    ).filter(
+        ojs.ArticleSetting.article_id.in_(published_ids),
+        ojs.ArticleSetting.setting_name.in_(SEARCH_SETTINGS.keys()),
+    )
+    for article_id, setting_name, setting_value in settings:
+        field = SEARCH_SETTINGS[setting_name][0]
+        frequencies[article_id].update((term, field) for term in tokenize(setting_value))
+
+    authors = session.query(
+        ojs.Author.submission_id,
+        ojs.Author.first_name,
+        ojs.Author.middle_name,
+        ojs.Author.last_name,
+    ).filter(ojs.Author.submission_id.in_(published_ids))
+    for article_id, first_name, middle_name, last_name in authors:
+        frequencies[article_id].update((term, 'authors') for name in (first_name, middle_name, last_name) for term in tokenize(name))
+
+    terms, documents = [], []
+    for article_id in published_ids:
+        counts = frequencies.get(article_id)
+        if not counts:
+            continue
+        terms.extend({'term': term, 'article_id': article_id, 'field': field, 'frequency': frequency} for (term, field), frequency in counts.iteritems())
+        documents.append({'article_id': article_id, 'length': sum(SEARCH_FIELD_WEIGHTS[field] * frequency for (term, field), frequency in counts.iteritems())})
+    return terms, documents
+
+def _write_search_index(session, article_ids):
+    terms, documents = search_index_rows(session, article_ids)
+    session.bulk_insert_mappings(ojs.SearchTerm, terms)
+    session.bulk_insert_mappings(ojs.SearchDocument, documents)
+
+def create_search_index(engine):
+    _create_index_tables(engine, ojs.SearchTerm, ojs.SearchDocument)
+
+def reindex_articles(session, article_ids):
+    """
+    replaces the search index entries of the given articles. does nothing if the index tables don't exist.
+    """
+    if not article_ids or not _index_table_exists(session, ojs.SearchDocument):
+        return
+    session.query(ojs.SearchTerm).filter(ojs.SearchTerm.article_id.in_(article_ids)).delete(synchronize_session=False)
+    session.query(ojs.SearchDocument).filter(ojs.SearchDocument.article_id.in_(article_ids)).delete(synchronize_session=False)
+    _write_search_index(session, article_ids)
+    session.flush()
+    invalidate_search_stats(session)
+
+def rebuild_search_index(session, chunk_size=500):
+    """
+    (re)builds the whole search index, creating the tables if needed. run this after articles are published in OJS.
+    """
+    create_search_index(session.get_bind())
+    session.query(ojs.SearchTerm).delete(synchronize_session=False)
+    session.query(ojs.SearchDocument).delete(synchronize_session=False)
+    article_ids = [row.article_id for row in session.query(ojs.PublishedArticle.article_id).filter(ojs.PublishedArticle.date_published != None)]
+    for start in xrange(0, len(article_ids), chunk_size):
+        _write_search_index(session, article_ids[start:start + chunk_size])
+    session.commit()
+    invalidate_search_stats(session)
+    return len(article_ids)
+
+def get_search_stats(session):
+    """
+    returns (document count, average weighted document length) of the search index.
+    """
+    return search_stats_cache.get(_database_key(session), lambda: tuple(session.query(func.count(ojs.SearchDocument.article_id), func.avg(ojs.SearchDocument.length)).one()))
+
+def invalidate_search_stats(session):
+    database_key = _database_key(session)
+    return search_stats_cache.invalidate(lambda key: key == database_key)
+
+def search_articles(session, search_term, fields=None, limit=50, k1=1.2, b=0.75):
+    """
+    ranks the indexed articles matching any term of search_term with BM25, field weighted by SEARCH_FIELD_WEIGHTS.
+    returns [(article_id, score)], best first.
+    """
+    terms = set(tokenize(search_term))
+    document_count, average_length = get_search_stats(session)
+    if not terms or not document_count:
+        return []
+
+    filters = [ojs.SearchTerm.term.in_(terms)]
+    if fields:
+        filters.append(ojs.SearchTerm.field.in_(fields))
+    postings = session.query(
+        ojs.SearchTerm.term,
+        ojs.SearchTerm.article_id,
+        ojs.SearchTerm.field,
+        ojs.SearchTerm.frequency,
+        ojs.SearchDocument.length,
+    ).join(
+        ojs.SearchDocument, ojs.SearchDocument.article_id == ojs.SearchTerm.article_id
+    ).filter(*filters)
+
+    frequencies = collections.defaultdict(int)
+    lengths = {}
+    for term, article_id, field, frequency, length in postings:
+        frequencies[(term, article_id)] += SEARCH_FIELD_WEIGHTS.get(field, 1) * frequency
+        lengths[article_id] = length
+
+    document_frequencies = collections.Counter(term for term, article_id in frequencies)
+    average_length = float(average_length) or 1.0
+    scores = collections.defaultdict(float)
+    for (term, article_id), frequency in frequencies.iteritems():
+        df = document_frequencies[term]
+        idf = math.log(1 + (document_count - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[article_id] / average_length)
+        scores[article_id] += idf * frequency * (k1 + 1) / (frequency + norm)
+
+    ranked = sorted(scores.iteritems(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit] if limit else ranked
+
+#
+# OJS keyword search
+#
+
+# article_search_objects.type values (ARTICLE_SEARCH_* in OJS' ArticleSearch)
+ARTICLE_SEARCH_AUTHOR = 0x01
+ARTICLE_SEARCH_TITLE = 0x02
+ARTICLE_SEARCH_ABSTRACT = 0x04
+ARTICLE_SEARCH_DISCIPLINE = 0x08
+ARTICLE_SEARCH_SUBJECT = 0x10
+ARTICLE_SEARCH_TYPE = 0x20
+ARTICLE_SEARCH_COVERAGE = 0x40
+ARTICLE_SEARCH_GALLEY_FILE = 0x80
+ARTICLE_SEARCH_SUPPLEMENTARY_FILE = 0x100
+ARTICLE_SEARCH_INDEX_TERMS = 0x78
+
+OJS_SEARCH_MIN_LENGTH = 3
+OJS_SEARCH_MAX_LENGTH = 40
+
+# OJS' registry/stopwords.txt, used by ArticleSearchIndex::filterKeywords
+OJS_SEARCH_STOPWORDS = frozenset((
+    'a', 'about', 'above', 'according', 'across', 'actually', 'adj', 'after', 'afterwards', 'again', 'against',
+    'all', 'almost', 'alone', 'along', 'already', 'also', 'although', 'always', 'among', 'amongst', 'an', 'and',
+    'another', 'any', 'anyhow', 'anyone', 'anything', 'anywhere', 'are', 'aren', 'around', 'as', 'at', 'b', 'be',
+    'became', 'because', 'become', 'becomes', 'becoming', 'been', 'before', 'beforehand', 'begin', 'beginning',
+    'behind', 'being', 'below', 'beside', 'besides', 'between', 'beyond', 'billion', 'both', 'but', 'by', 'c',
+    'can', 'cannot', 'caption', 'co', 'could', 'couldn', 'd', 'did', 'didn', 'do', 'does', 'doesn', 'don', 'down',
+    'during', 'e', 'each', 'eg', 'eight', 'eighty', 'either', 'else', 'elsewhere', 'end', 'ending', 'enough', 'etc',
+    'even', 'ever', 'every', 'everyone', 'everything', 'everywhere', 'except', 'f', 'few', 'fifty', 'first', 'five',
+    'for', 'former', 'formerly', 'forty', 'found', 'four', 'from', 'further', 'g', 'h', 'had', 'has', 'hasn',
+    'have', 'haven', 'he', 'hence', 'her', 'here', 'hereafter', 'hereby', 'herein', 'hereupon', 'hers', 'herself',
+    'him', 'himself', 'his', 'how', 'however', 'hundred', 'i', 'ie', 'if', 'in', 'inc', 'indeed', 'instead', 'into',
+    'is', 'isn', 'it', 'its', 'itself', 'j', 'k', 'l', 'last', 'later', 'latter', 'latterly', 'least', 'less',
+    'let', 'like', 'likely', 'ltd', 'm', 'made', 'make', 'makes', 'many', 'maybe', 'me', 'meantime', 'meanwhile',
+    'might', 'million', 'miss', 'more', 'moreover', 'most', 'mostly', 'mr', 'mrs', 'much', 'must', 'my', 'myself',
+    'n', 'namely', 'neither', 'never', 'nevertheless', 'next', 'nine', 'ninety', 'no', 'nobody', 'none',
+    'nonetheless', 'noone', 'nor', 'not', 'nothing', 'now', 'nowhere', 'o', 'of', 'off', 'often', 'on', 'once',
+    'one', 'only', 'onto', 'or', 'others', 'otherwise', 'our', 'ours', 'ourselves', 'out', 'over', 'overall', 'own',
+    'p', 'per', 'perhaps', 'q', 'r', 'rather', 'recent', 'recently', 's', 'same', 'seem', 'seemed', 'seeming',
+    'seems', 'seven', 'seventy', 'several', 'she', 'should', 'shouldn', 'since', 'six', 'sixty', 'so', 'some',
+    'somehow', 'someone', 'something', 'sometime', 'sometimes', 'somewhere', 'still', 'stop', 'such', 't', 'taking',
+    'ten', 'than', 'that', 'the', 'their', 'them', 'themselves', 'then', 'thence', 'there', 'thereafter', 'thereby',
+    'therefore', 'therein', 'thereupon', 'these', 'they', 'thirty', 'this', 'those', 'though', 'thousand', 'three',
+    'through', 'throughout', 'thru', 'thus', 'to', 'together', 'too', 'toward', 'towards', 'trillion', 'twenty',
+    'two', 'u', 'under', 'unless', 'unlike', 'unlikely', 'until', 'up', 'upon', 'us', 'used', 'using', 'v', 'very',
+    'via', 'w', 'was', 'wasn', 'we', 'well', 'were', 'weren', 'what', 'whatever', 'when', 'whence', 'whenever',
+    'where', 'whereafter', 'whereas', 'whereby', 'wherein', 'whereupon', 'wherever', 'whether', 'which', 'while',
+    'whither', 'who', 'whoever', 'whole', 'whom', 'whose', 'why', 'will', 'with', 'within', 'without', 'won',
+    'would', 'wouldn', 'x', 'y', 'yes', 'yet', 'you', 'your', 'yours', 'yourself', 'yourselves', 'z',
+))
+
+# the same substitutions as OJS' SearchHelperParser::cleanText
+_ojs_search_removed = re.compile(u'[!"#$%\'().?@\\[\\]^`{}~]', re.UNICODE)
+_ojs_search_spaced = re.compile(u'[+,:;&/<=>|\\\\]', re.UNICODE)
+_ojs_search_phrases = re.compile(r'"([^"]*)"|(\S+)', re.UNICODE)
+# what PHP's is_numeric accepts, once cleanText has removed '.' and '+'
+_ojs_search_numeric = re.compile(r'^-?\d+(e-?\d+)?$')
+
+def ojs_search_keywords(text, allow_wildcards=False, stopwords=OJS_SEARCH_STOPWORDS):
+    """
+    splits text into keywords the way OJS' filterKeywords does: cleaned, lower cased, stopwords, numbers and words
+    shorter than OJS_SEARCH_MIN_LENGTH dropped. with allow_wildcards a '*' becomes a LIKE '%'.
+    """
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'replace')
+    text = _ojs_search_spaced.sub(' ', _ojs_search_removed.sub('', text))
+    text = text.replace('*', '%' if allow_wildcards else ' ').lower()
+    return [
+        word[:OJS_SEARCH_MAX_LENGTH] for word in text.split()
+        if len(word) >= OJS_SEARCH_MIN_LENGTH and word not in stopwords and not _ojs_search_numeric.match(word)
+    ]
+
+def parse_ojs_search_query(search_term):
+    """
+    returns the phrases of a query as lists of keywords. "quoted text" is one phrase, any other word its own
+    phrase. every phrase must match for an article to be found. words ojs_search_keywords filters out are
+    ignored, as OJS ignores them, rather than matching nothing.
+    """
+    phrases = []
+    for quoted, word in _ojs_search_phrases.findall(search_term or ''):
+        keywords = ojs_search_keywords(quoted or word, allow_wildcards=True)
+        if keywords:
+            phrases.append(keywords)
+    return phrases
+
+def _phrase_objects(phrase, keyword_ids, postings):
+    # objects holding the keywords of phrase at consecutive positions, as {object_id: hits}.
+    def positions(keyword):
+        merged = collections.defaultdict(set)
+        for keyword_id in keyword_ids.get(keyword, ()):
+            for object_id, object_positions in postings[keyword_id].iteritems():
+                merged[object_id].update(object_positions)
+        return merged
+
+    matches = positions(phrase[0])
+    for offset, keyword in enumerate(phrase[1:], 1):
+        following = positions(keyword)
+        matches = dict(
+            (object_id, set(pos for pos in starts if pos + offset in following[object_id]))
+            for object_id, starts in matches.iteritems() if object_id in following
+        )
+    return dict((object_id, len(starts)) for object_id, starts in matches.iteritems() if starts)
+
+def ojs_keyword_search(session, search_term, object_types=None, limit=50):
+    """
+    searches OJS' article_search_* index, supporting "phrase queries" and * wildcards. object_types is a
+    mask of ARTICLE_SEARCH_* values limiting the indexed fields searched. returns [(article_id, hits)] for published
+    articles, most hits first.
+    """
+    phrases = parse_ojs_search_query(search_term)
+    if not phrases:
+        return []
+
+    keywords = set(keyword for phrase in phrases for keyword in phrase)
+    exact = [keyword for keyword in keywords if '%' not in keyword]
+    patterns = [keyword for keyword in keywords if '%' in keyword]
+    keyword_ids = collections.defaultdict(set)
+    rows = session.query(
+        ojs.ArticleSearchKeywordList.keyword_id,
+        ojs.ArticleSearchKeywordList.keyword_text,
+    ).filter(
+        or_(ojs.ArticleSearchKeywordList.keyword_text.in_(exact), *[ojs.ArticleSearchKeywordList.keyword_text.like(pattern) for pattern in patterns])
+    )
+    patterns = [(pattern, re.compile('.*'.join(re.escape(part) for part in pattern.split('%')) + '$', re.UNICODE)) for pattern in patterns]
+    for keyword_id, keyword_text in rows:
+        if keyword_text in keywords:
+            keyword_ids[keyword_text].add(keyword_id)
+        for pattern, matcher in patterns:
+            if matcher.match(keyword_text):
+                keyword_ids[pattern].add(keyword_id)
+    if any(keyword not in keyword_ids for keyword in keywords):
+        return []
+
+    object_keywords = ojs.t_article_search_object_keywords.c
+    query = session.query(
+        object_keywords.keyword_id,
+        object_keywords.object_id,
+        object_keywords.pos,
+    ).filter(
+        object_keywords.keyword_id.in_(set(keyword_id for ids in keyword_ids.itervalues() for keyword_id in ids))
+    )
+    if object_types:
+        query = query.join(
+            ojs.ArticleSearchObject, ojs.ArticleSearchObject.object_id == object_keywords.object_id
+        ).filter(ojs.ArticleSearchObject.type.op('&')(object_types) != 0)
+    postings = collections.defaultdict(lambda: collections.defaultdict(set))
+    for keyword_id, object_id, pos in query:
+        postings[keyword_id][object_id].add(pos)
+
+    matches = [_phrase_objects(phrase, keyword_ids, postings) for phrase in phrases]
+    object_ids = set(object_id for phrase_objects in matches for object_id in phrase_objects)
+    if not object_ids:
+        return []
+
+    object_articles = dict(session.query(
+        ojs.ArticleSearchObject.object_id,
+        ojs.ArticleSearchObject.article_id,
+    ).join(
+        ojs.PublishedArticle, ojs.PublishedArticle.article_id == ojs.ArticleSearchObject.article_id
+    ).join(
+        ojs.Issue, ojs.Issue.issue_id == ojs.PublishedArticle.issue_id
+    ).filter(
+        ojs.ArticleSearchObject.object_id.in_(object_ids),
+        ojs.Issue.date_published != None,
+    ))
+
+    # an article matches when every phrase matches one of its objects, phrases may match different fields.
+    hits = None
+    for phrase_objects in matches:
+        phrase_hits = collections.Counter()
+        for object_id, count in phrase_objects.iteritems():
+            if object_id in object_articles:
+                phrase_hits[object_articles[object_id]] += count
+        hits = phrase_hits if hits is None else collections.Counter(dict((article_id, hits[article_id] + count) for article_id, count in phrase_hits.iteritems() if article_id in hits))
+
+    ranked = sorted(hits.iteritems(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit] if limit else ranked
+
+def ojs_keyword_search_articles(session, search_term, object_types=None, limit=50):
+    return ranked_articles(session, [article_id for article_id, hits in ojs_keyword_search(session, search_term, object_types, limit)])
+
+def ranked_articles(session, article_ids):
+    """
+    Article query for article_ids, keeping their order.
+    """
+    query = session.query(ojs.Article).filter(ojs.Article.article_id.in_(article_ids))
+    if not article_ids:
+        return query
+    return query.order_by(case(dict((article_id, rank) for rank, article_id in enumerate(article_ids)), value=ojs.Article.article_id))
+
+#
+# bulk writes
+#
+
+_insert_id_steps = {}
+
+def _insert_id_step(session):
+    # the step between the ids of one multi-row INSERT, or None when they can't be worked out from the first id.
+    # MySQL steps by auto_increment_increment (more than 1 on replicated and Galera setups) unless
+    # innodb_autoinc_lock_mode is 2 (interleaved), where other inserts can take ids in between.
+    dialect = session.get_bind().dialect
+    if dialect.name == 'sqlite':
+        return 1
+    if dialect.name != 'mysql':
+        return None
+    database_key = _database_key(session)
+    if database_key not in _insert_id_steps:
+        lock_mode, increment = session.execute('SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment').first()
+        _insert_id_steps[database_key] = None if lock_mode == 2 else int(increment)
+    return _insert_id_steps[database_key]
+
+def insert_returning_ids(session, id_column, rows, chunk_size=500):
+    """
+    inserts rows into id_column's table with multi-row INSERTs and returns the generated ids in input order.
+    rows are grouped by their keys, so they don't all need the same columns.
+    """
+    table = id_column.table
+    connection = session.connection()
+    dialect_name = connection.dialect.name
+    step = _insert_id_step(session)
+    ids = [None] * len(rows)
+
+    groups = collections.OrderedDict()
+    for position, row in enumerate(rows):
+        groups.setdefault(tuple(sorted(row)), []).append(position)
+
+    for keys, positions in groups.iteritems():
+        for start in xrange(0, len(positions), chunk_size):
+            batch = positions[start:start + chunk_size]
+            values = [rows[position] for position in batch]
+            if id_column.key in keys:
+                connection.execute(table.insert().values(values))
+                new_ids = [row[id_column.key] for row in values]
+            elif dialect_name == 'postgresql':
+                new_ids = [row[0] for row in connection.execute(table.insert().values(values).returning(id_column))]
+            elif step:
+                last_id = connection.execute(table.insert().values(values)).lastrowid
+                # LAST_INSERT_ID() is the first id of the batch on MySQL, sqlite reports the last one.
+                first_id = last_id - (len(values) - 1) * step if dialect_name == 'sqlite' else last_id
+                new_ids = range(first_id, first_id + len(values) * step, step)
+            else:
+                new_ids = [connection.execute(table.insert().values(row)).inserted_primary_key[0] for row in values]
+            for position, new_id in izip(batch, new_ids):
+                ids[position] = new_id
+    return ids
+
+def upsert_settings(session, settings_class, rows, update_columns=('setting_value',), chunk_size=500):
+    """
+    inserts settings rows, or updates update_columns of the rows already there, keyed on settings_class' primary key.
+    one INSERT .. ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE per chunk on MySQL and PostgreSQL, other backends
+    get an UPDATE and, if nothing matched, an INSERT per row. rows must all have the same keys.
+    """
+    table = settings_class.__table__
+    key_columns = list(table.primary_key.columns)
+    connection = session.connection()
+    dialect_name = connection.dialect.name
+
+    for start in xrange(0, len(rows), chunk_size):
+        batch = rows[start:start + chunk_size]
+        if dialect_name == 'mysql':
+            statement = mysql_insert(table).values(batch)
+            connection.execute(statement.on_duplicate_key_update(**dict((column, statement.inserted[column]) for column in update_columns)))
+        elif dialect_name == 'postgresql':
+            statement = postgresql_insert(table).values(batch)
+            connection.execute(statement.on_conflict_do_update(index_elements=key_columns, set_=dict((column, statement.excluded[column]) for column in update_columns)))
+        else:
+            for row in batch:
+                updated = connection.execute(table.update().where(and_(*[column == row[column.key] for column in key_columns])).values(**dict((column, row[column]) for column in update_columns)))
+                if not updated.rowcount:
+                    connection.execute(table.insert().values(row))
+    return len(rows)
+
+def write_settings(session, settings_class, rows, update_columns=('setting_value',), chunk_size=500):
+    """
+    writes settings rows the way the update_or_create functions always have: a setting stored under the row's
+    locale, or under a single other locale, is updated where it is and keeps its locale. a setting stored under
+    several other locales, or not at all, gets a new row in the row's locale. one SELECT per chunk finds the
+    stored locales, then every row goes through upsert_settings.
+    """
+    owner_key = SETTINGS_OWNER_KEYS[settings_class]
+    owner_column = getattr(settings_class, owner_key)
+
+    for start in xrange(0, len(rows), chunk_size):
+        batch = rows[start:start + chunk_size]
+        existing = collections.defaultdict(set)
+        for owner_id, setting_name, locale in session.query(owner_column, settings_class.setting_name, settings_class.locale).filter(
+            owner_column.in_(set(row[owner_key] for row in batch)),
+            settings_class.setting_name.in_(set(row['setting_name'] for row in batch)),
+        ):
+            existing[(owner_id, setting_name)].add(locale)
+
+        targets = []
+        for row in batch:
+            locales = existing[(row[owner_key], row['setting_name'])]
+            if row['locale'] not in locales and len(locales) == 1:
+                row = dict(row, locale=next(iter(locales)))
+            targets.append(row)
+        upsert_settings(session, settings_class, targets, update_columns, chunk_size)
+    return len(rows)
+
+def get_owner_setting(session, settings_class, owner_id, setting_name, locale):
+    """
+    the row write_settings wrote for an owner's setting, preferring the given locale.
+    """
+    owner_column = getattr(settings_class, SETTINGS_OWNER_KEYS[settings_class])
+    rows = session.query(settings_class).populate_existing().filter(owner_column == owner_id, settings_class.setting_name == setting_name).all()
+    for row in rows:
+        if row.locale == locale:
+            return row
+    return rows[0] if rows else None
+
+def settings_rows(owner_key, owner_settings, locale='', setting_type='string', **columns):
+    """
+    settings rows for {owner_id: {setting_name: setting_value}}, columns are added to every row.
+    """
+    rows = []
+    for owner_id, settings in owner_settings.iteritems():
+        for setting_name, setting_value in settings.iteritems():
+            row = {
+                owner_key: owner_id,
+                'locale': locale,
+                'setting_name': setting_name,
+                'setting_value': setting_value,
+                'setting_type': setting_type,
+            }
+            row.update(columns)
+            rows.append(row)
+    return rows
+
 #
 # ORM Queries
 #
@@ -78,26 +1206,113 @@ def deltadate(days, start_date=None):
 def contact_settings(session, settings_to_get):
     return session.query(ojs.JournalSetting).filter(ojs.JournalSetting.setting_name.in_(settings_to_get))
 
+def get_cached_contact_settings(session, settings_to_get):
+    """
+    contact_settings from the journal settings cache, as a list.
+    """
+    settings_to_get = set(settings_to_get)
+    return [row for row in get_cached_journal_settings(session).rows if row.setting_name in settings_to_get]
+
+def get_group_settings_with_groups(session, locale):
+    return session.query(
+        ojs.GroupSettings.group_id,
+        ojs.GroupSettings.setting_value,
+        ojs.Group.publish_email,
+    ).join(
+        ojs.Group,
+        ojs.GroupSettings.group_id == ojs.Group.group_id
+    ).filter(
+        ojs.GroupSettings.locale == locale
+    ).order_by(
+        ojs.Group.seq
+    ).all()
+
+def get_group_members(session, group_ids):
+    """Return the members of every group in group_ids, keyed by group_id.
+
+    Users are fetched column-wise in the same query so the eager roles and
+    interests joins on the User mapper are not triggered.
+    """
+    members = collections.defaultdict(list)
+    if not group_ids:
+        return members
+
+    rows = session.query(
+        ojs.GroupMemberships.group_id,
+        ojs.User.user_id,
+        ojs.User.first_name,
+        ojs.User.last_name,
+        ojs.User.email,
+        ojs.User.url,
+        ojs.User.country,
+    ).join(
+        ojs.User,
+        ojs.GroupMemberships.user_id == ojs.User.user_id
+    ).filter(
+        ojs.GroupMemberships.group_id.in_(group_ids)
+    ).order_by(
+        ojs.GroupMemberships.group_id,
+        ojs.GroupMemberships.seq
+    )
+
+    for row in rows:
+        members[row.group_id].append(row)
+    return members
+
+def get_users_affiliation_and_bio(session, user_ids, locale):
+    """Return {user_id: {'affiliation': ..., 'bio': ...}} for many users at once.
+
+    Mirrors get_user_affiliation and get_user_bio: affiliation prefers the
+    requested locale and falls back to any locale, bio uses the locale only.
+    """
+    details = dict((user_id, {'affiliation': None, 'bio': None}) for user_id in user_ids)
+    if not user_ids:
+        return details
+
+    rows = session.query(
+        ojs.UserSetting.user_id,
+        ojs.UserSetting.locale,
+        ojs.UserSetting.setting_name,
+        ojs.UserSetting.setting_value,
+    ).filter(
+        ojs.UserSetting.user_id.in_(user_ids),
+        ojs.UserSetting.setting_name.in_(['affiliation', 'biography'])
+    )
+
+    fallback_affiliations = {}
+    for row in rows:
+        if row.setting_name == 'affiliation':
+            if row.locale == locale:
+                details[row.user_id]['affiliation'] = row.setting_value
+            else:
+                fallback_affiliations.setdefault(row.user_id, row.setting_value)
+        elif row.locale == locale:
+            details[row.user_id]['bio'] = row.setting_value
+
+    for user_id, affiliation in fallback_affiliations.iteritems():
+        if details[user_id]['affiliation'] is None:
+            details[user_id]['affiliation'] = affiliation
+
+    return details
+
 def editorial_team(session, locale='en_US'):
     group_dict = collections.OrderedDict()
-    groups = session.query(ojs.GroupSettings).join(ojs.Group, ojs.GroupSettings.group_id == ojs.Group.group_id).filter(ojs.GroupSettings.locale == locale).order_by(ojs.Group.seq)
-    if not groups.count():
-        groups = session.query(ojs.GroupSettings).join(ojs.Group, ojs.GroupSettings.group_id == ojs.Group.group_id).filter(ojs.GroupSettings.locale == 'en_US').order_by(ojs.Group.seq)
-    for g in groups:
-        members = session.query(ojs.GroupMemberships).filter(ojs.GroupMemberships.group_id == g.group_id).order_by(ojs.GroupMemberships.seq)
-        group = session.query(ojs.Group).filter(ojs.Group.group_id == g.group_id).one()
+    groups = get_group_settings_with_groups(session, locale)
+    if not groups:
+        groups = get_group_settings_with_groups(session, 'en_US')
 
-        group_dict[g.setting_value] = [{'first_name': m.user.first_name, 'last_name': m.user.last_name, 'email': m.user.email, 'url': m.user.url,  'affiliation': get_user_affiliation(session, m.user.user_id, locale), 'bio': get_user_bio(session, m.user.user_id, locale), 'country': m.user.country, 'display_email': group.publish_email } for m in members if m.user]
+    members = get_group_members(session, set(g.group_id for g in groups))
+    user_ids = set(m.user_id for group_members in members.itervalues() for m in group_members)
+    user_details = get_users_affiliation_and_bio(session, user_ids, locale)
+
+    for g in groups:
+        group_dict[g.setting_value] = [{'first_name': m.first_name, 'last_name': m.last_name, 'email': m.email, 'url': m.url,  'affiliation': user_details[m.user_id]['affiliation'], 'bio': user_details[m.user_id]['bio'], 'country': m.country, 'display_email': g.publish_email } for m in members[g.group_id]]
 
     return group_dict
 
 
 def get_serialized_setting(session, setting_name):
-    try:
-        serial = session.query(ojs.JournalSetting.setting_value).filter(ojs.JournalSetting.setting_name == setting_name).one()
-        return loads(serial[0], array_hook=collections.OrderedDict)
-    except NoResultFound:
-        return None
+    return get_cached_journal_settings(session).get_unserialized(setting_name)
 
 def get_user_affiliation(session, user_id, locale=None):
     try:
@@ -121,11 +1336,7 @@ def get_user_bio(session, user_id, locale):
     return user_bio.get('setting_value', None)
 
 def get_additional_policies(session, locale=None):
-    try:
-        serial = session.query(ojs.JournalSetting.setting_value).filter(ojs.JournalSetting.setting_name == 'customAboutItems', ojs.JournalSetting.locale == locale).one()
-        return loads(serial[0], array_hook=collections.OrderedDict)
-    except NoResultFound:
-        return None
+    return get_cached_journal_settings(session, locale=locale).get_unserialized('customAboutItems')
 
 def get_section_policies(session, locale=None):
     section_dict = collections.OrderedDict()
@@ -188,13 +1399,13 @@ def get_journal_editors(session):
     return users
 
 def get_journal_setting(session, setting_name, locale=None):
-    try:
-        return session.query(ojs.JournalSetting.setting_value).filter(ojs.JournalSetting.setting_name == setting_name, ojs.JournalSetting.locale == locale).one()
-    except NoResultFound:
-        try:
-            return session.query(ojs.JournalSetting.setting_value).filter(ojs.JournalSetting.setting_name == setting_name, ojs.JournalSetting.locale == 'en_US').one()
-        except NoResultFound:
-            return None
+    for setting_locale in (locale, 'en_US'):
+        rows = get_cached_journal_settings(session, locale=setting_locale).get(setting_name)
+        if len(rows) > 1:
+            raise MultipleResultsFound('Multiple rows were found for %s' % setting_name)
+        elif rows:
+            return JournalSettingValue(rows[0].setting_value)
+    return None
 
 def ojs_journal_settings(session, locale=None):
     return session.query(ojs.JournalSetting).filter(ojs.JournalSetting.locale == locale)
@@ -203,19 +1414,16 @@ def feeling_lucky_settings(session):
     return session.query(ojs.JournalSetting)
 
 def non_localised_setting(session, setting_name):
-    try:
-        return session.query(ojs.JournalSetting.setting_value).filter(ojs.JournalSetting.setting_name == setting_name).first()
-    except NoResultFound:
-        return None
+    rows = get_cached_journal_settings(session).get(setting_name)
+    return JournalSettingValue(rows[0].setting_value) if rows else None
 
 def get_submission_checklist(session, locale):
-    try:
-        checklist = session.query(ojs.JournalSetting.setting_value).filter(ojs.JournalSetting.setting_name == 'submissionChecklist', ojs.JournalSetting.locale == locale).one()
-        return loads(checklist[0], array_hook=collections.OrderedDict)
-    except NoResultFound:
-        return None
+    return get_cached_journal_settings(session, locale=locale).get_unserialized('submissionChecklist')
+
+def get_article_list(session, filter_checks=None, order_by=None, articles_per_page=25, offset=0, taxonomy=0, use_index=False):
+    if use_index:
+        return get_indexed_article_list(session, filter_checks, order_by, articles_per_page, offset, taxonomy)
 
-def get_article_list(session, filter_checks=None, order_by=None, articles_per_page=25, offset=0, taxonomy=0):
     order_list = []
     if order_by == 'page_number':
         order_list.append(desc(ojs.Article.pages))
@@ -228,52 +1436,111 @@ def get_article_list(session, filter_checks=None, order_by=None, articles_per_pa
         filter_taxonomy.append(ojs.TaxonomyArticle.taxonomy_id == taxonomy)
         join_taxonomy.append(ojs.TaxonomyArticle)
 
-    if not filter_checks:
-        return session.query(ojs.Article).join(ojs.Section).join(*join_taxonomy).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None, *filter_taxonomy).order_by(*order_list).offset(offset).limit(articles_per_page)
-    else:
-        return session.query(ojs.Article).join(ojs.Section).join(*join_taxonomy).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None, ojs.Article.section_id.in_(filter_checks), *filter_taxonomy).order_by(*order_list).offset(offset).limit(articles_per_page)
+    if not filter_checks:
+        return with_article_profile(session.query(ojs.Article), 'listing').join(ojs.Section).join(*join_taxonomy).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None, *filter_taxonomy).order_by(*order_list).offset(offset).limit(articles_per_page)
+    else:
+        return with_article_profile(session.query(ojs.Article), 'listing').join(ojs.Section).join(*join_taxonomy).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None, ojs.Article.section_id.in_(filter_checks), *filter_taxonomy).order_by(*order_list).offset(offset).limit(articles_per_page)
+
+def get_indexed_article_list(session, filter_checks=None, order_by=None, articles_per_page=25, offset=0, taxonomy=0):
+    if order_by == 'page_number':
+        order_list = [desc(ojs.Article.pages)]
+    elif order_by == 'section':
+        order_list = [desc(ojs.PublishedArticleIndex.section_seq)]
+    else:
+        order_list = [desc(ojs.PublishedArticleIndex.date_published)]
+
+    query = indexed_articles(session)
+    if filter_checks:
+        query = query.filter(ojs.PublishedArticleIndex.section_id.in_(filter_checks))
+    if taxonomy > 0:
+        query = query.join(ojs.TaxonomyArticle, ojs.TaxonomyArticle.article_id == ojs.Article.article_id).filter(ojs.TaxonomyArticle.taxonomy_id == taxonomy)
+    return query.order_by(*order_list).offset(offset).limit(articles_per_page)
+
+def get_article_count(session, filter_checks=None, taxonomy=0, use_index=False):
+    """
+    counts published articles, optionally limited to sections and a taxonomy. results are cached for a minute.
+    """
+    filters = [ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None]
+    joins = []
+    if filter_checks:
+        filter_checks = tuple(sorted(filter_checks))
+        filters.append(ojs.Article.section_id.in_(filter_checks))
+    if taxonomy > 0:
+        joins.append(ojs.TaxonomyArticle)
+        filters.append(ojs.TaxonomyArticle.taxonomy_id == taxonomy)
+
+    key = (_database_key(session), filter_checks or None, taxonomy, use_index)
+    if use_index:
+        index_filters = [ojs.PublishedArticleIndex.issue_date_published != None]
+        if filter_checks:
+            index_filters.append(ojs.PublishedArticleIndex.section_id.in_(filter_checks))
+        if taxonomy > 0:
+            index_filters.append(ojs.TaxonomyArticle.taxonomy_id == taxonomy)
+        count_query = lambda: session.query(func.count(ojs.PublishedArticleIndex.article_id)).join(*[(ojs.TaxonomyArticle, ojs.TaxonomyArticle.article_id == ojs.PublishedArticleIndex.article_id)] if taxonomy > 0 else []).filter(*index_filters).one()
+    else:
+        count_query = lambda: session.query(func.count(ojs.Article.article_id)).join(*joins).join(ojs.PublishedArticle).join(ojs.Issue).filter(*filters).one()
+    return article_count_cache.get(key, count_query)
+
+def encode_article_cursor(date_published, published_article_id):
+    return base64.urlsafe_b64encode(json.dumps([date_published.strftime('%Y-%m-%d %H:%M:%S.%f'), published_article_id]))
+
+def decode_article_cursor(token):
+    """
+    returns (date_published, published_article_id) from a token made by encode_article_cursor, raising ValueError if it
+    is malformed.
+    """
+    try:
+        date_published, published_article_id = json.loads(base64.urlsafe_b64decode(str(token)))
+        return datetime.strptime(date_published, '%Y-%m-%d %H:%M:%S.%f'), int(published_article_id)
+    except (TypeError, ValueError, UnicodeEncodeError):
+        raise ValueError('Invalid article cursor: %r' % (token,))
+
+def get_article_list_page(session, filter_checks=None, articles_per_page=25, after=None, taxonomy=0):
+    """
+    keyset paginated version of get_article_list, newest first.
+
+    after is the opaque token from a previous page. returns {'articles': [...], 'next': token or None, 'total': count},
+    where each page is an index range read rather than an OFFSET scan.
+    """
+    filters = [ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None]
+    joins = []
+    if filter_checks:
+        filters.append(ojs.Article.section_id.in_(filter_checks))
+    if taxonomy > 0:
+        joins.append(ojs.TaxonomyArticle)
+        filters.append(ojs.TaxonomyArticle.taxonomy_id == taxonomy)
+    if after:
+        date_published, published_article_id = decode_article_cursor(after)
+        filters.append(or_(
+            ojs.PublishedArticle.date_published < date_published,
+            and_(ojs.PublishedArticle.date_published == date_published, ojs.PublishedArticle.published_article_id < published_article_id)
+        ))
+
+    articles = with_article_profile(session.query(ojs.Article), 'listing').join(ojs.Section).join(*joins).join(ojs.PublishedArticle).join(ojs.Issue).filter(*filters).order_by(desc(ojs.PublishedArticle.date_published), desc(ojs.PublishedArticle.published_article_id)).limit(articles_per_page + 1).all()
+
+    next_token = None
+    if len(articles) > articles_per_page:
+        articles = articles[:articles_per_page]
+        last = articles[-1].published_article
+        next_token = encode_article_cursor(last.date_published, last.published_article_id)
+
+    return {
+        'articles': articles,
+        'next': next_token,
+        'total': get_article_count(session, filter_checks, taxonomy)[0],
+    }
 
-def get_article_count(session):
-    return session.query(func.count(ojs.Article.article_id)).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None).one()
+def _get_resolved_article(session, article_id, issue_published=True):
+    # the map can be up to a ttl old, so the article must still be published.
+    if article_id is None:
+        return None
+    return session.query(ojs.Article).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.Article.article_id == article_id, published_articles_filter(issue_published)).first()
 
 def get_article(session, doi):
-    try:
-        return session.query(ojs.Article).join(ojs.ArticleSetting).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.ArticleSetting.setting_name == 'pub-id::doi', ojs.ArticleSetting.setting_value == doi, ojs.Issue.date_published != None).one()
-    except NoResultFound:
-        try:
-            return session.query(ojs.Article).join(ojs.ArticleSetting).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.ArticleSetting.setting_name == 'pub-id::publisher-id', ojs.ArticleSetting.setting_value == doi, ojs.Issue.date_published != None).one()
-        except NoResultFound:
-            return None
+    return _get_resolved_article(session, resolve_article_identifier(session, doi, kinds=('doi', 'publisher-id')))
 
 def get_article_by_id(session, id):
-    try:
-        return session.query(
-            ojs.Article
-        ).join(
-            ojs.PublishedArticle
-        ).join(
-            ojs.Issue
-        ).filter(
-            ojs.Article.article_id == id,
-            ojs.Issue.date_published != None
-        ).one()
-    except NoResultFound:
-        try:
-            return session.query(
-                ojs.Article
-            ).join(
-                ojs.ArticleSetting
-            ).join(
-                ojs.PublishedArticle
-            ).join(
-                ojs.Issue
-            ).filter(
-                ojs.ArticleSetting.setting_name == 'pub-id::publisher-id',
-                ojs.ArticleSetting.setting_value == id,
-                ojs.Issue.date_published != None
-            ).one()
-        except NoResultFound:
-            return None
+    return _get_resolved_article(session, resolve_article_identifier(session, id, kinds=('id', 'publisher-id')))
 
 
 def get_article_by_id_preview(session, id):
@@ -307,19 +1574,31 @@ def get_article_by_id_preview(session, id):
 
 
 def get_article_by_pubid(session, pubid):
-    try:
-        return session.query(ojs.Article).join(ojs.ArticleSetting).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.ArticleSetting.setting_name == 'pub-id::publisher-id', ojs.ArticleSetting.setting_value == pubid, ojs.Issue.date_published != None).one()
-    except NoResultFound:
+    article = _get_resolved_article(session, resolve_article_identifier(session, pubid, kinds=('publisher-id',)))
+    if article is None:
         try:
             return session.query(ojs.Article).join(ojs.ArticleSetting).filter(ojs.Article.article_id == pubid).one()
         except NoResultFound:
             return None
+    return article
+
+def get_articles_by_year(session, year, use_index=False):
+    if use_index:
+        return session.query(ojs.Article).join(ojs.PublishedArticleIndex, ojs.PublishedArticleIndex.article_id == ojs.Article.article_id).filter(in_year(ojs.PublishedArticleIndex.date_published, year))
+    return session.query(ojs.Article).join(ojs.PublishedArticle).filter(in_year(ojs.PublishedArticle.date_published, year))
 
-def get_articles_by_year(session, year):
-    return session.query(ojs.Article).join(ojs.PublishedArticle).filter(extract('year', ojs.PublishedArticle.date_published) == year)
+def in_year(column, year):
+    # a date range rather than extract('year', column) == year, so an index on column can be used. a year that
+    # isn't a number, or has no datetime range (9999 and later), matches nothing.
+    try:
+        year = int(year)
+        start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    except (TypeError, ValueError, OverflowError):
+        return false()
+    return and_(column >= start, column < end)
 
 def get_issues_by_year(session, year):
-    return session.query(ojs.Issue).filter(extract('year', ojs.Issue.date_published) == year)
+    return session.query(ojs.Issue).filter(in_year(ojs.Issue.date_published, year))
 
 def get_all_article_settings(session, article_id):
     return session.query(ojs.ArticleSetting).filter(ojs.ArticleSetting.article_id == article_id)
@@ -334,8 +1613,10 @@ def get_article_settings(session, article_id, setting_name):
     ).first()
 
 
-def get_latest_articles(session, limit):
-    return session.query(ojs.Article).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None).order_by(ojs.PublishedArticle.date_published.desc(), ojs.PublishedArticle.seq.desc()).limit(limit)
+def get_latest_articles(session, limit, use_index=False):
+    if use_index:
+        return indexed_articles(session).order_by(ojs.PublishedArticleIndex.date_published.desc(), ojs.PublishedArticleIndex.seq.desc()).limit(limit)
+    return with_article_profile(session.query(ojs.Article), 'listing').join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None).order_by(ojs.PublishedArticle.date_published.desc(), ojs.PublishedArticle.seq.desc()).limit(limit)
 
 def get_popular_articles(session, limit):
     return session.query(ojs.Article).join(ojs.PublishedArticle).order_by(ojs.PublishedArticle.date_published.desc()).limit(limit)
@@ -385,6 +1666,83 @@ def get_section(session, section_id):
 def get_issues(session):
     return session.query(ojs.Issue).join(ojs.CustomIssueOrder, ojs.Issue.issue_id == ojs.CustomIssueOrder.issue_id).filter(ojs.Issue.date_published != None, or_(ojs.Issue.access_status == 0, ojs.Issue.access_status == 1, and_(ojs.Issue.access_status == 2, ojs.Issue.open_access_date<=date.today()))).order_by(asc(ojs.CustomIssueOrder.seq), desc(ojs.Issue.issue_id))
 
+ARCHIVE_ISSUE_COLUMNS = (
+    ojs.Issue.issue_id,
+    ojs.Issue.journal_id,
+    ojs.Issue.volume,
+    ojs.Issue.number,
+    ojs.Issue.year,
+    ojs.Issue.date_published,
+    ojs.Issue.access_status,
+    ojs.Issue.open_access_date,
+    ojs.Issue.show_volume,
+    ojs.Issue.show_number,
+    ojs.Issue.show_year,
+    ojs.Issue.show_title,
+    ojs.Issue.current,
+)
+
+def build_issue_archive(session, journal_id=None, locales=None):
+    """
+    the archive of published issues in custom issue order as {'issues': {issue_id: issue}, 'years':
+    OrderedDict(year: [issue_id])}, issues being dicts with their settings resolved for locales (DEFAULT_LOCALES
+    if none are given). years (of date_published) come in the order of their first issue. the access status isn't
+    applied here, see get_issue_archive.
+    """
+    locales = list(locales or DEFAULT_LOCALES)
+    filters = [
+        ojs.Issue.issue_id == ojs.CustomIssueOrder.issue_id,
+        ojs.Issue.date_published != None,
+        ojs.Issue.access_status.in_([0, 1, 2]),
+    ]
+    if journal_id is not None:
+        filters.append(ojs.Issue.journal_id == journal_id)
+    issues = _column_rows(session, ARCHIVE_ISSUE_COLUMNS + (ojs.CustomIssueOrder.seq,), *filters, order_by=(asc(ojs.CustomIssueOrder.seq), desc(ojs.Issue.issue_id)))
+    settings = get_settings_for_owners(session, ojs.IssueSettings, [issue['issue_id'] for issue in issues], locales)
+
+    years = collections.OrderedDict()
+    for issue in issues:
+        issue['settings'] = settings[issue['issue_id']]
+        years.setdefault(issue['date_published'].year, []).append(issue['issue_id'])
+    return {
+        'issues': collections.OrderedDict((issue['issue_id'], issue) for issue in issues),
+        'years': years,
+    }
+
+issue_archive_cache = TTLCache(maxsize=64, ttl=300)
+
+def _issue_open(issue, today):
+    # today is midnight, matching open_access_date <= date.today() in get_issues
+    return issue['access_status'] != 2 or (issue['open_access_date'] is not None and issue['open_access_date'] <= today)
+
+def get_issue_archive(session, journal_id=None, locales=None):
+    """
+    build_issue_archive served from memory, rebuilt every issue_archive_cache.ttl seconds or after
+    invalidate_issue_archive. issues whose open access date hasn't come yet are left out, as in get_issues.
+    returns OrderedDict(year: [issue]), the issues are shared, treat them as read only.
+    """
+    locales = list(locales or DEFAULT_LOCALES)
+    key = (_database_key(session), journal_id, tuple(locales))
+    archive = issue_archive_cache.get(key, lambda: build_issue_archive(session, journal_id, locales))
+    today = datetime.combine(date.today(), datetime.min.time())
+    years = collections.OrderedDict()
+    for year, issue_ids in archive['years'].iteritems():
+        issues = [archive['issues'][issue_id] for issue_id in issue_ids if _issue_open(archive['issues'][issue_id], today)]
+        if issues:
+            years[year] = issues
+    return years
+
+def get_archive_issues_by_year(session, year, journal_id=None, locales=None):
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return []
+    return get_issue_archive(session, journal_id, locales).get(year, [])
+
+def invalidate_issue_archive(session):
+    database_key = _database_key(session)
+    return issue_archive_cache.invalidate(lambda key: key[0] == database_key)
+
 def get_issue(session, volume_id, issue_id, ojs_id):
     try:
         return session.query(ojs.Issue).filter(ojs.Issue.volume == volume_id, ojs.Issue.number == issue_id, ojs.Issue.issue_id == ojs_id, ojs.Issue.date_published <= datetime.now(), or_(ojs.Issue.access_status == 0, ojs.Issue.access_status == 1, and_(ojs.Issue.access_status == 2, ojs.Issue.open_access_date<=datetime.now()))).one()
@@ -400,12 +1758,136 @@ def get_issue_preview(session, ojs_id):
 def get_issue_settings(session, issue_id):
     return session.query(ojs.IssueSettings).filter(ojs.IssueSettings.issue_id == issue_id)
 
-def get_issue_articles(session, volume_id, issue_id, ojs_id):
-    return session.query(ojs.Article).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.volume == volume_id, ojs.Issue.number == issue_id, ojs.Issue.issue_id == ojs_id).order_by(ojs.PublishedArticle.seq)
+def get_issue_articles(session, volume_id, issue_id, ojs_id, use_index=False):
+    if use_index:
+        return with_article_profile(session.query(ojs.Article), 'listing').join(ojs.PublishedArticleIndex, ojs.PublishedArticleIndex.article_id == ojs.Article.article_id).filter(ojs.PublishedArticleIndex.issue_volume == volume_id, ojs.PublishedArticleIndex.issue_number == issue_id, ojs.PublishedArticleIndex.issue_id == ojs_id).order_by(ojs.PublishedArticleIndex.seq)
+    return with_article_profile(session.query(ojs.Article), 'listing').join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.volume == volume_id, ojs.Issue.number == issue_id, ojs.Issue.issue_id == ojs_id).order_by(ojs.PublishedArticle.seq)
 
 def get_issue_articles_by_section_id(session, ojs_id, section_id):
     return session.query(ojs.Article).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.issue_id == ojs_id, ojs.Article.section_id == section_id).order_by(ojs.PublishedArticle.seq)
 
+def _column_rows(session, columns, *filters, **kwargs):
+    # plain dicts for the given columns, for structures that are cached outside the session.
+    keys = [column.key for column in columns]
+    query = session.query(*columns).filter(*filters)
+    if kwargs.get('order_by') is not None:
+        query = query.order_by(*kwargs['order_by'])
+    return [dict(izip(keys, row)) for row in query]
+
+TOC_ARTICLE_COLUMNS = (
+    ojs.Article.article_id,
+    ojs.Article.section_id,
+    ojs.Article.pages,
+    ojs.Article.language,
+    ojs.PublishedArticle.published_article_id,
+    ojs.PublishedArticle.seq,
+    ojs.PublishedArticle.access_status,
+    ojs.PublishedArticle.date_published,
+)
+TOC_AUTHOR_COLUMNS = (
+    ojs.Author.author_id,
+    ojs.Author.submission_id,
+    ojs.Author.primary_contact,
+    ojs.Author.seq,
+    ojs.Author.first_name,
+    ojs.Author.middle_name,
+    ojs.Author.last_name,
+    ojs.Author.suffix,
+    ojs.Author.country,
+    ojs.Author.url,
+)
+TOC_GALLEY_COLUMNS = (
+    ojs.ArticleGalley.galley_id,
+    ojs.ArticleGalley.article_id,
+    ojs.ArticleGalley.file_id,
+    ojs.ArticleGalley.label,
+    ojs.ArticleGalley.locale,
+    ojs.ArticleGalley.html_galley,
+    ojs.ArticleGalley.remote_url,
+    ojs.ArticleGalley.seq,
+)
+
+def build_issue_toc(session, issue_id, locales=None):
+    """
+    the table of contents of an issue as plain dicts and lists, so it can be cached:
+    {'issue': {..., 'settings': {...}}, 'sections': [{..., 'settings': {...}, 'articles': [{..., 'settings': {...},
+    'authors': [...], 'galleys': [...]}]}]}. sections follow the issue's custom section order, falling back to
+    their own seq, articles their published seq. runs nine queries whatever the size of the issue, None if there
+    is no such published issue. as in get_issue_articles, only published articles are listed. the publication and
+    open access dates are checked against the clock by get_issue_toc, see issue_toc_visible. settings are
+    resolved for locales, DEFAULT_LOCALES if none are given.
+    """
+    locales = list(locales or DEFAULT_LOCALES)
+    issues = _column_rows(
+        session,
+        list(ojs.Issue.__table__.columns),
+        ojs.Issue.issue_id == issue_id,
+        ojs.Issue.date_published != None,
+        ojs.Issue.access_status.in_([0, 1, 2]),
+    )
+    if not issues:
+        return None
+    issue = issues[0]
+    issue['settings'] = get_settings_for_owners(session, ojs.IssueSettings, [issue_id], locales)[issue_id]
+    custom_order = dict(session.query(ojs.CustomSectionOrders.section_id, ojs.CustomSectionOrders.seq).filter(ojs.CustomSectionOrders.issue_id == issue_id))
+
+    articles = _column_rows(
+        session,
+        TOC_ARTICLE_COLUMNS,
+        ojs.PublishedArticle.article_id == ojs.Article.article_id,
+        ojs.PublishedArticle.issue_id == issue_id,
+        ojs.PublishedArticle.date_published != None,
+        order_by=(ojs.PublishedArticle.seq, ojs.Article.article_id),
+    )
+    article_ids = [article['article_id'] for article in articles]
+    section_ids = set(article['section_id'] for article in articles)
+
+    sections = dict((section['section_id'], section) for section in _column_rows(session, list(ojs.Section.__table__.columns), ojs.Section.section_id.in_(section_ids))) if section_ids else {}
+    section_settings = get_settings_for_owners(session, ojs.SectionSettings, section_ids, locales)
+    article_settings = get_settings_for_owners(session, ojs.ArticleSetting, article_ids, locales)
+    authors, galleys = collections.defaultdict(list), collections.defaultdict(list)
+    if article_ids:
+        for author in _column_rows(session, TOC_AUTHOR_COLUMNS, ojs.Author.submission_id.in_(article_ids), order_by=(ojs.Author.seq,)):
+            authors[author['submission_id']].append(author)
+        for galley in _column_rows(session, TOC_GALLEY_COLUMNS, ojs.ArticleGalley.article_id.in_(article_ids), order_by=(ojs.ArticleGalley.seq,)):
+            galleys[galley['article_id']].append(galley)
+
+    for section_id, section in sections.iteritems():
+        section['settings'] = section_settings[section_id]
+        section['articles'] = []
+    for article in articles:
+        article['settings'] = article_settings[article['article_id']]
+        article['authors'] = authors[article['article_id']]
+        article['galleys'] = galleys[article['article_id']]
+        if article['section_id'] in sections:
+            sections[article['section_id']]['articles'].append(article)
+
+    return {
+        'issue': issue,
+        'sections': sorted(sections.values(), key=lambda section: (custom_order.get(section['section_id'], section['seq']), section['section_id'])),
+    }
+
+issue_toc_cache = TTLCache(maxsize=256, ttl=300)
+
+def get_issue_toc(session, issue_id, locales=None):
+    """
+    build_issue_toc, cached per database for issue_toc_cache.ttl seconds. None until the issue is visible, see
+    issue_toc_visible. the result is shared, treat it as read only.
+    """
+    locales = list(locales or DEFAULT_LOCALES)
+    key = (_database_key(session), issue_id, tuple(locales))
+    toc = issue_toc_cache.get(key, lambda: build_issue_toc(session, issue_id, locales))
+    return toc if toc is not None and issue_toc_visible(toc) else None
+
+def issue_toc_visible(toc, now=None):
+    # the date part of get_issue's filter: published and, for delayed open access, past the open access date.
+    now = now or datetime.now()
+    return toc['issue']['date_published'] <= now and _issue_open(toc['issue'], now)
+
+def invalidate_issue_toc(session, issue_id=None):
+    database_key = _database_key(session)
+    return issue_toc_cache.invalidate(lambda key: key[0] == database_key and issue_id in (None, key[1]))
+
 def get_issue_preview_articles_by_section_id(session, ojs_id, section_id):
     return session.query(ojs.Article).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.Issue.issue_id == ojs_id, ojs.Article.section_id == section_id).order_by(ojs.PublishedArticle.seq)
 
@@ -519,25 +2001,28 @@ def get_announcement_type_settings(session, type_id):
 
 
 def transfer_user(session, ojs_user_dict, ojs_user_settings_dict):
-    new_obj = ojs.User(**ojs_user_dict)
-    session.add(new_obj)
-    session.flush()
+    return bulk_transfer_users(session, [(ojs_user_dict, ojs_user_settings_dict)])[0]
 
-    for k,v in ojs_user_settings_dict.iteritems():
-        kwargs = {
-                'user_id': new_obj.user_id,
-                'setting_name': k,
-                'setting_value': v,
-                'locale': 'en_US',
-                'setting_type': 'string', # only for introduced settings, so fairly safe but only if we do validation on our end
-                'assoc_type': 0,
+def bulk_transfer_users(session, users):
+    '''
+    Creates users from (user dict, settings dict) pairs in one transaction, returns their ids in input order
+    '''
+    user_ids = insert_returning_ids(session, ojs.User.user_id, [user for user, settings in users])
+
+    session.bulk_insert_mappings(ojs.UserSetting, [
+        {
+            'user_id': user_id,
+            'setting_name': k,
+            'setting_value': v,
+            'locale': 'en_US',
+            'setting_type': 'string', # only for introduced settings, so fairly safe but only if we do validation on our end
+            'assoc_type': 0,
         }
-        new_setting = ojs.UserSetting(**kwargs)
-        session.add(new_setting)
-        session.flush()
+        for user_id, (user, settings) in izip(user_ids, users) for k, v in settings.iteritems()
+    ])
 
     session.commit()
-    return new_obj.user_id
+    return user_ids
 
 def transfer_taxonomy(session, article_id, taxonomy_id):
     new_taxonomy_article = ojs.TaxonomyArticle(article_id=article_id, taxonomy_id=taxonomy_id)
@@ -549,74 +2034,64 @@ def article_transfer_stage_one(session, article_one, article_settings, taxonomy_
     '''
     Creates the initial article, gets the id and creates its settings values
     '''
+    return bulk_article_transfer_stage_one(session, [(article_one, article_settings, taxonomy_id)])[0]
 
-    new_article = ojs.Article(**article_one)
-    session.add(new_article)
-    session.flush()
+def bulk_article_transfer_stage_one(session, articles):
+    '''
+    Creates articles from (article dict, settings dict, taxonomy_id) tuples with their settings, first review round and
+    taxonomy in one transaction, returns the new article ids in input order
+    '''
+    article_ids = insert_returning_ids(session, ojs.Article.article_id, [article[0] for article in articles])
 
     # Add Article Settings
-    for k,v in article_settings.iteritems():
-        kwargs = {
-            'article_id': new_article.article_id,
+    session.bulk_insert_mappings(ojs.ArticleSetting, [
+        {
+            'article_id': article_id,
             'locale': 'en_US',
             'setting_name': k,
             'setting_value': v,
             'setting_type': 'string',
         }
-        new_article_setting = ojs.ArticleSetting(**kwargs)
-        session.add(new_article_setting)
-        session.flush()
-
-    # Add Review Round
-    review_kwargs = {
-        'submission_id': new_article.article_id,
-        'stage_id': None,
-        'round': 1,
-        'review_revision': 1,
-        'status': None,
-    }
-    new_review_round = ojs.ReviewRound(**review_kwargs)
-    session.add(new_review_round)
-    session.flush()
+        for article_id, article in izip(article_ids, articles) for k, v in article[1].iteritems()
+    ])
+
+    # Add Review Rounds
+    session.bulk_insert_mappings(ojs.ReviewRound, [
+        {
+            'submission_id': article_id,
+            'stage_id': None,
+            'round': 1,
+            'review_revision': 1,
+            'status': None,
+        }
+        for article_id in article_ids
+    ])
 
-    if taxonomy_id:
-        transfer_taxonomy(session, new_article.article_id, taxonomy_id)
+    session.bulk_insert_mappings(ojs.TaxonomyArticle, [
+        {'article_id': article_id, 'taxonomy_id': article[2]}
+        for article_id, article in izip(article_ids, articles) if len(article) > 2 and article[2]
+    ])
 
     session.commit()
-    return new_article.article_id
-
-def set_article_setting(session, article, setting_name, setting_value):
-
-    try:
-        try:
-            setting = session.query(ojs.ArticleSetting).filter(ojs.ArticleSetting.article_id == article.get('article_id'), ojs.ArticleSetting.setting_name == setting_name).one()
-            setting.setting_value = setting_value
-            session.flush()
-            return setting
-        except MultipleResultsFound:
-            settings = session.query(ojs.ArticleSetting).filter(ojs.ArticleSetting.article_id == article.get('article_id'), ojs.ArticleSetting.setting_name == setting_name, ojs.ArticleSetting.locale != None)
-            for setting in settings:
-                session.delete(setting)
-            session.flush()
+    return article_ids
 
-            setting = session.query(ojs.ArticleSetting).filter(ojs.ArticleSetting.article_id == article.get('article_id'), ojs.ArticleSetting.setting_name == setting_name).one()
-            setting.setting_value = setting_value
-            session.flush()
-            return setting
+def set_article_setting(session, article, setting_name, setting_value, locale=''):
+    set_article_settings(session, {article.get('article_id'): {setting_name: setting_value}}, locale)
+    return get_owner_setting(session, ojs.ArticleSetting, article.get('article_id'), setting_name, locale)
 
-    except NoResultFound:
-        kwargs = {
-            'article_id': article.get('article_id'),
-            'locale': '',
-            'setting_name': setting_name,
-            'setting_value': setting_value,
-            'setting_type': 'string',
-        }
-        new_article_setting = ojs.ArticleSetting(**kwargs)
-        session.add(new_article_setting)
-        session.flush()
+def set_article_settings(session, article_settings, locale=''):
+    """
+    writes {article_id: {setting_name: setting_value}} with write_settings and keeps the identifier map and the
+    search and published article indexes up to date.
+    """
+    write_settings(session, ojs.ArticleSetting, settings_rows('article_id', article_settings, locale))
 
-        return new_article_setting
+    changed = lambda names: [article_id for article_id, settings in article_settings.iteritems() if names.intersection(settings)]
+    if changed(set(IDENTIFIER_SETTINGS)):
+        invalidate_article_identifiers(session)
+    reindex_articles(session, changed(set(SEARCH_SETTINGS)))
+    refresh_published_article_index(session, changed(set(PUBLISHED_ARTICLE_INDEX_SETTINGS)))
+    invalidate_issue_toc(session)
 
 def file_transfer(session, _dict, file_id, file_type, file_extension):
     '''
@@ -651,22 +2126,28 @@ def create_supp_record(session, _dict):
     session.commit()
 
 def insert_article_author(session, article_author, article_author_settings):
-    new_author = ojs.Author(**article_author)
-    session.add(new_author)
-    session.commit()
+    return bulk_insert_article_authors(session, [(article_author, article_author_settings)])[0]
 
-    for k,v in article_author_settings.iteritems():
-        kwargs = {
-            'author_id': new_author.author_id,
+def bulk_insert_article_authors(session, authors):
+    '''
+    Creates authors from (author dict, settings dict) pairs in one transaction, returns their ids in input order
+    '''
+    author_ids = insert_returning_ids(session, ojs.Author.author_id, [author for author, settings in authors])
+
+    session.bulk_insert_mappings(ojs.AuthorSetting, [
+        {
+            'author_id': author_id,
             'locale': 'en_US',
             'setting_name': k,
             'setting_value': v,
             'setting_type': 'string',
         }
-        new_author_setting = ojs.AuthorSetting(**kwargs)
-        session.add(new_author_setting)
+        for author_id, (author, settings) in izip(author_ids, authors) for k, v in settings.iteritems()
+    ])
 
+    reindex_articles(session, list(set(author['submission_id'] for author, settings in authors)))
     session.commit()
+    return author_ids
 
 def update_article_manuscript(session, ojs_article_id, file_id):
     article = session.query(ojs.Article).filter(ojs.Article.article_id == ojs_article_id).one()
@@ -731,21 +2212,44 @@ def get_user_by_id(session, user_id):
 def hash_password(username, password):
     return hashlib.sha1(("%s%s" % (username, password)).encode('utf-8')).hexdigest()
 
+def _utf8(value):
+    return value.encode('utf-8') if isinstance(value, unicode) else value
+
 def get_login_user(session, username, password, unhashed_password):
-    try:
-        return session.query(ojs.User).filter(ojs.User.username == username, ojs.User.password == password).one()
-    except NoResultFound:
+    return resolve_login(session, username, password, unhashed_password)
 
-        # If the user is not found, we move on to try and get the user based on email address, then rehash the password with that username to see if there is a match
-        try:
-            user = get_user_from_email(session, username)
-            if user:
-                password = hash_password(user.username, unhashed_password)
-                return session.query(ojs.User).filter(ojs.User.username == user.username, ojs.User.password == password).one()
-            else:
-                return None
-        except NoResultFound:
-            return None
+def _same_login(value, login):
+    return value is not None and value.lower() == login.lower()
+
+def resolve_login(session, login, password, unhashed_password):
+    """
+    the User whose username, or failing that email, is login and whose password matches, or None. password is the
+    hash for login as the username, the hash for an email login is made from the matching user's username.
+    login is matched case-insensitively, like MySQL's collation, so a miscased username is only checked against
+    password (hashed from login as given) and fails, as before.
+    only the columns needed to check the hash are read, the User (with its roles) is loaded after a match.
+    """
+    candidates = session.query(
+        ojs.User.user_id,
+        ojs.User.username,
+        ojs.User.email,
+        ojs.User.password,
+    ).filter(
+        or_(ojs.User.username == login, ojs.User.email == login)
+    ).all()
+
+    # a username match wins over an email match, as before
+    candidates.sort(key=lambda candidate: not _same_login(candidate.username, login))
+    for candidate in candidates:
+        expected = []
+        if _same_login(candidate.username, login):
+            expected.append(password)
+        if _same_login(candidate.email, login):
+            expected.append(hash_password(candidate.username, unhashed_password))
+        for hashed in expected:
+            if hashed and candidate.password and hmac.compare_digest(_utf8(candidate.password), _utf8(hashed)):
+                return session.query(ojs.User).filter(ojs.User.user_id == candidate.user_id).one()
+    return None
 
 def set_password(session, user_id, password):
     user = session.query(ojs.User).filter(ojs.User.user_id == user_id).one()
@@ -764,16 +2268,69 @@ def get_session_from_sessionid(session, ojs_session_id):
     except NoResultFound:
         return None
 
+def load_session_user(session, ojs_session_id):
+    """
+    returns (Sessions, User) for a session whose user has at least one role, with the user's roles loaded, in one
+    query. None if there is no such session.
+    """
+    rows = session.query(
+        ojs.Sessions,
+        ojs.User,
+    ).join(
+        ojs.User, ojs.User.user_id == ojs.Sessions.user_id
+    ).join(
+        ojs.User.roles
+    ).options(
+        contains_eager(ojs.User.roles),
+        lazyload(ojs.User.interests),
+    ).filter(
+        ojs.Sessions.session_id == ojs_session_id
+    ).all()
+    return rows[0] if rows else None
+
 def get_user_from_sessionid(session, ojs_session_id):
-    user_session = get_session_from_sessionid(session, ojs_session_id)
+    session_user = load_session_user(session, ojs_session_id)
+    return session_user[1] if session_user else None
 
-    if user_session:
-        try:
-            return session.query(ojs.User).join(ojs.Roles).filter(ojs.User.user_id == user_session.user_id).one()
-        except NoResultFound:
+ResolvedSession = collections.namedtuple('ResolvedSession', [
+    'session_id', 'user_id', 'username', 'email', 'first_name', 'last_name', 'roles',
+    'ip_address', 'user_agent', 'created', 'last_used', 'remember', 'data',
+])
+
+# resolved sessions are plain tuples, so they can be shared between db sessions and threads.
+session_cache = TTLCache(maxsize=10000, ttl=30)
+
+def resolve_session(session, ojs_session_id):
+    """
+    the ResolvedSession for ojs_session_id, or None, cached for session_cache.ttl seconds. roles is a frozenset of
+    (journal_id, role_id).
+    """
+    def load():
+        session_user = load_session_user(session, ojs_session_id)
+        if session_user is None:
             return None
-    else:
-        return None
+        user_session, user = session_user
+        return ResolvedSession(
+            session_id=user_session.session_id,
+            user_id=user.user_id,
+            username=user.username,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            roles=frozenset((role.journal_id, role.role_id) for role in user.roles),
+            ip_address=user_session.ip_address,
+            user_agent=user_session.user_agent,
+            created=user_session.created,
+            last_used=user_session.last_used,
+            remember=user_session.remember,
+            data=user_session.data,
+        )
+
+    return session_cache.get((_database_key(session), ojs_session_id), load)
+
+def invalidate_session(session, ojs_session_id):
+    key = (_database_key(session), ojs_session_id)
+    return session_cache.invalidate(lambda cached_key: cached_key == key)
 
 def add_session_to_db(db_session, session_id, user, serialised_data, ip, user_agent, time_stamp):
     kwargs = {
@@ -790,14 +2347,218 @@ def add_session_to_db(db_session, session_id, user, serialised_data, ip, user_ag
     new_session = ojs.Sessions(**kwargs)
     db_session.add(new_session)
     db_session.commit()
+    invalidate_session(db_session, session_id)
+
+def delete_session(db_session, session_id):
+    """
+    logs a session out.
+    """
+    db_session.query(ojs.Sessions).filter(ojs.Sessions.session_id == session_id).delete(synchronize_session=False)
+    db_session.commit()
+    invalidate_session(db_session, session_id)
+    session_activity.discard(db_session, session_id)
+
+def update_sessions_last_used(session, last_used, ip_addresses=None, chunk_size=500):
+    """
+    writes {session_id: last_used}, and {session_id: ip_address} if given, with one UPDATE per chunk of sessions,
+    never moving last_used backwards. returns the number of rows updated.
+    """
+    ip_addresses = ip_addresses or {}
+    session_ids = list(last_used)
+    updated = 0
+    for start in xrange(0, len(session_ids), chunk_size):
+        chunk = session_ids[start:start + chunk_size]
+        new_last_used = case(dict((session_id, last_used[session_id]) for session_id in chunk), value=ojs.Sessions.session_id)
+        values = {ojs.Sessions.last_used: new_last_used}
+        new_ips = dict((session_id, ip_addresses[session_id]) for session_id in chunk if ip_addresses.get(session_id))
+        if new_ips:
+            values[ojs.Sessions.ip_address] = case(new_ips, value=ojs.Sessions.session_id, else_=ojs.Sessions.ip_address)
+        updated += session.query(ojs.Sessions).filter(
+            ojs.Sessions.session_id.in_(chunk),
+            ojs.Sessions.last_used < new_last_used,
+        ).update(values, synchronize_session=False)
+    return updated
+
+
+class SessionActivity(object):
+    """
+    buffers the last_used time and ip address of sessions per database so that a request only records them in
+    memory, flush() then writes all the buffered sessions of a database at once. repeated hits on a session are
+    coalesced into one write. each database buffers at most maxsize sessions and has its own wakeup event, so a
+    burst on one journal doesn't hold back the others. hits on further sessions are dropped until the next flush
+    of that database, and a flush that fails puts its sessions back for the next one.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buffer = collections.defaultdict(dict)
+        self._wakeups = collections.defaultdict(threading.Event)
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.requeued = 0
+        self.written = 0
+        self.flushes = 0
+
+    def wakeup(self, database_key):
+        """
+        the event set when database_key's buffer is full.
+        """
+        with self._lock:
+            return self._wakeups[database_key]
+
+    def _merge(self, buffered, session_id, last_used, ip_address):
+        # keeps the newest last_used of a session, and the last ip address seen. False if the buffer is full.
+        if session_id in buffered:
+            previous_last_used, previous_ip = buffered[session_id]
+            if last_used >= previous_last_used:
+                buffered[session_id] = (last_used, ip_address or previous_ip)
+            else:
+                buffered[session_id] = (previous_last_used, previous_ip or ip_address)
+            return True
+        if len(buffered) >= self.maxsize:
+            return False
+        buffered[session_id] = (last_used, ip_address)
+        return True
+
+    def record(self, session, session_id, last_used, ip_address=None):
+        database_key = _database_key(session)
+        with self._lock:
+            self.recorded += 1
+            buffered = self._buffer[database_key]
+            if session_id in buffered:
+                self.coalesced += 1
+            elif len(buffered) >= self.maxsize:
+                self.dropped += 1
+                self._wakeups[database_key].set()
+                return False
+            return self._merge(buffered, session_id, last_used, ip_address)
+
+    def discard(self, session, session_id):
+        with self._lock:
+            self._buffer[_database_key(session)].pop(session_id, None)
+
+    def pending(self, database_key=None):
+        with self._lock:
+            if database_key is not None:
+                return len(self._buffer.get(database_key, ()))
+            return sum(len(buffered) for buffered in self._buffer.itervalues())
+
+    def flush(self, session):
+        database_key = _database_key(session)
+        with self._lock:
+            buffered = self._buffer.pop(database_key, {})
+        if not buffered:
+            return 0
+        try:
+            updated = update_sessions_last_used(
+                session,
+                dict((session_id, last_used) for session_id, (last_used, ip_address) in buffered.iteritems()),
+                dict((session_id, ip_address) for session_id, (last_used, ip_address) in buffered.iteritems() if ip_address),
+            )
+            session.commit()
+        except Exception:
+            # merged with whatever was recorded meanwhile, so the next flush writes it.
+            with self._lock:
+                current = self._buffer[database_key]
+                for session_id, (last_used, ip_address) in buffered.iteritems():
+                    if self._merge(current, session_id, last_used, ip_address):
+                        self.requeued += 1
+                    else:
+                        self.dropped += 1
+            raise
+        with self._lock:
+            self.written += updated
+            self.flushes += 1
+        return updated
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': sum(len(buffered) for buffered in self._buffer.itervalues()),
+                'recorded': self.recorded,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'requeued': self.requeued,
+                'written': self.written,
+                'flushes': self.flushes,
+            }
+
+
+session_activity = SessionActivity()
+
+
+class SessionActivityRecorder(threading.Thread):
+    """
+    writes the session activity buffered for one database behind the requests: a daemon thread flushes it every
+    interval seconds, or sooner when the buffer fills, using sessions from session_factory (a sessionmaker).
+    stop() flushes what is left, and is called at interpreter exit.
+    """
+
+    def __init__(self, session_factory, activity=session_activity, interval=5.0):
+        super(SessionActivityRecorder, self).__init__(name='ojssqla-session-activity')
+        self.daemon = True
+        self.session_factory = session_factory
+        self.activity = activity
+        self.interval = interval
+        self.errors = 0
+        self._stopping = threading.Event()
+        session = session_factory()
+        try:
+            self.database_key = _database_key(session)
+        finally:
+            session.close()
+        self.wakeup = activity.wakeup(self.database_key)
+
+    def start(self):
+        super(SessionActivityRecorder, self).start()
+        atexit.register(self.stop)
 
-def basic_search(session, search_term):
+    def flush(self):
+        session = self.session_factory()
+        try:
+            return self.activity.flush(session)
+        except Exception:
+            self.errors += 1
+            session.rollback()
+            logger.exception('Could not write the buffered session activity, it will be retried')
+            return 0
+        finally:
+            session.close()
+
+    def run(self):
+        while not self._stopping.is_set():
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if not self._stopping.is_set():
+                self.flush()
+
+    def stop(self, timeout=None):
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self.wakeup.set()
+        if self.is_alive():
+            self.join(timeout)
+        self.flush()
+
+def basic_search(session, search_term, use_index=False, limit=50):
+    if use_index:
+        return ranked_articles(session, [article_id for article_id, score in search_articles(session, search_term, limit=limit)])
     return session.query(ojs.Article).join(ojs.ArticleSetting).join(ojs.PublishedArticle).filter(ojs.PublishedArticle.date_published != None).filter(or_(and_(ojs.ArticleSetting.setting_name == 'title', ojs.ArticleSetting.setting_value.match(search_term)), and_(ojs.ArticleSetting.setting_name == 'abstract', ojs.ArticleSetting.setting_value.match(search_term)) ) )
 
 def cloud_search_articles(session, dois):
-    return session.query(ojs.Article).join(ojs.ArticleSetting).join(ojs.PublishedArticle).filter(ojs.PublishedArticle.date_published != None).filter(ojs.ArticleSetting.setting_name == 'pub-id::doi').filter(ojs.ArticleSetting.setting_value.in_(dois))
-
-def collection_search(session, search_term):
+    article_ids = set(resolve_article_identifiers(session, dois, kinds=('doi',), issue_published=False).values())
+    return session.query(ojs.Article).join(ojs.PublishedArticle).filter(ojs.Article.article_id.in_(article_ids), published_articles_filter(False))
+
+def collection_search(session, search_term, use_index=False, limit=50):
+    if use_index:
+        article_ids = [article_id for article_id, score in search_articles(session, search_term, fields=['title'], limit=limit)]
+        doi_match = resolve_article_identifier(session, search_term, kinds=('doi',), issue_published=False)
+        if doi_match is not None and doi_match not in article_ids:
+            article_ids.insert(0, doi_match)
+        return ranked_articles(session, article_ids)
     return session.query(ojs.Article).join(ojs.ArticleSetting).join(ojs.PublishedArticle).filter(ojs.PublishedArticle.date_published != None).filter(or_(and_(ojs.ArticleSetting.setting_name == 'title', ojs.ArticleSetting.setting_value.match(search_term)), and_(ojs.ArticleSetting.setting_name == 'pub-id::doi', ojs.ArticleSetting.setting_value == search_term) ) )
 
 def get_user_settings(session, user_id):
@@ -807,27 +2568,8 @@ def get_user_settings_dict(session, user_id):
     return dict_ojs_settings_results(session.query(ojs.UserSetting).filter(ojs.UserSetting.user_id == user_id))
 
 def update_or_create_user_setting(session, user_id, setting_name, setting_value, locale=None, setting_type='string'):
-
-    try:
-        setting = session.query(ojs.UserSetting).filter(ojs.UserSetting.user_id == user_id, ojs.UserSetting.setting_name == setting_name, ojs.UserSetting.locale == locale).one()
-        setattr(setting, 'setting_value', setting_value)
-        session.flush()
-        return setting
-
-    except NoResultFound:
-        kwargs = {
-                'user_id': user_id,
-                'setting_name': setting_name,
-                'setting_value': setting_value,
-                'locale': locale,
-                'setting_type': setting_type,
-                'assoc_type': 0,
-            }
-        new_setting = ojs.UserSetting(**kwargs)
-        session.add(new_setting)
-
-    return new_setting
-
+    upsert_settings(session, ojs.UserSetting, settings_rows('user_id', {user_id: {setting_name: setting_value}}, locale, setting_type, assoc_type=0, assoc_id=0))
+    return session.query(ojs.UserSetting).populate_existing().filter(ojs.UserSetting.user_id == user_id, ojs.UserSetting.setting_name == setting_name, ojs.UserSetting.locale == locale).first()
 
 def get_author_settings(session, author_id):
     return session.query(ojs.AuthorSetting).filter(ojs.AuthorSetting.author_id == author_id)
@@ -859,8 +2601,16 @@ def get_user_from_id(session, user_id):
     except NoResultFound:
         return None
 
+FOOTER_SETTINGS = ('publisherInstitution', 'publisherUrl', 'onlineIssn', 'printIssn')
+
 def get_footer_settings(session):
-    return session.query(ojs.JournalSetting).filter(or_(ojs.JournalSetting.setting_name == 'publisherInstitution', ojs.JournalSetting.setting_name == 'publisherUrl',  ojs.JournalSetting.setting_name == 'onlineIssn',  ojs.JournalSetting.setting_name == 'printIssn'), ojs.JournalSetting.journal_id == 1)
+    return session.query(ojs.JournalSetting).filter(ojs.JournalSetting.setting_name.in_(FOOTER_SETTINGS), ojs.JournalSetting.journal_id == 1)
+
+def get_cached_footer_settings(session):
+    """
+    get_footer_settings from the journal settings cache, as a list.
+    """
+    return [row for row in get_cached_journal_settings(session, journal_id=1).rows if row.setting_name in FOOTER_SETTINGS]
 
 def get_current_issue(session):
     try:
@@ -910,27 +2660,9 @@ def set_new_user_details(session, user_id, user_dict, settings_dict):
     # update user details
     for k,v, in user_dict.iteritems():
         setattr(user, k, v)
-        session.flush
-
-    for k,v in settings_dict.iteritems():
-        # update user setting
-        try:
-            setting = session.query(ojs.UserSetting).filter(ojs.UserSetting.user_id == user_id, ojs.UserSetting.setting_name == k).one()
-            setattr(setting, 'setting_value', v )
-            session.flush()
 
-        # or create it:
-        except NoResultFound:
-            kwargs = {
-                    'user_id': user_id,
-                    'setting_name': k,
-                    'setting_value': v,
-                    'locale': 'en_US',
-                    'setting_type': 'string', # only for introduced settings, so fairly safe but only if we do validation on our end
-                    'assoc_type': 0,
-                }
-            new_setting = ojs.UserSetting(**kwargs)
-            session.add(new_setting)
+    # update or create the user settings, only for introduced settings, so fairly safe but only if we do validation on our end
+    write_settings(session, ojs.UserSetting, settings_rows('user_id', {user_id: settings_dict}, 'en_US', assoc_type=0, assoc_id=0))
 
     session.commit()
 
@@ -994,7 +2726,9 @@ def get_static_page(session, page):
 def get_page_settings(session, page_id):
     return session.query(ojs.StaticPageSetting).filter(ojs.StaticPageSetting.static_page_id == page_id)
 
-def latest_articles_feed(session):
+def latest_articles_feed(session, use_index=False):
+    if use_index:
+        return indexed_articles(session).order_by(desc(ojs.PublishedArticleIndex.date_published)).limit(10)
     return session.query(ojs.Article).join(ojs.PublishedArticle).join(ojs.Issue).filter(ojs.PublishedArticle.date_published != None, ojs.Issue.date_published != None).order_by(desc(ojs.PublishedArticle.date_published)).limit(10)
 
 def get_any_article(session, article_id):
@@ -1051,104 +2785,100 @@ def get_review_details(session, article_id):
     return review_assignments
 
 
-def get_incomplete_review_details(session):
-    review_assignments = all_as_dict(
-        session.query(
-            ojs.ReviewAssignment
-        ).filter(
-            ojs.ReviewAssignment.date_completed == None,
-            ojs.ReviewAssignment.date_reminded == None,
-            ojs.ReviewAssignment.date_notified != None,
-            ojs.ReviewAssignment.declined == 0,
-            ojs.ReviewAssignment.replaced == 0,
-            ojs.ReviewAssignment.cancelled == 0,
-            ojs.ReviewAssignment.reviewer_id == ojs.User.user_id
-        ).order_by(
-            ojs.ReviewAssignment.date_due
-        )
-    )
+REVIEW_REMINDER_FILTERS = {
+    'incomplete': (
+        ojs.ReviewAssignment.date_completed == None,
+        ojs.ReviewAssignment.date_reminded == None,
+        ojs.ReviewAssignment.date_notified != None,
+        ojs.ReviewAssignment.declined == 0,
+        ojs.ReviewAssignment.replaced == 0,
+        ojs.ReviewAssignment.cancelled == 0,
+        ojs.ReviewAssignment.reviewer_id == ojs.User.user_id,
+    ),
+    'unconfirmed': (
+        ojs.ReviewAssignment.date_confirmed == None,
+        ojs.ReviewAssignment.date_completed == None,
+        ojs.ReviewAssignment.date_reminded == None,
+        ojs.ReviewAssignment.declined == 0,
+        ojs.ReviewAssignment.replaced == 0,
+        ojs.ReviewAssignment.cancelled == 0,
+    ),
+    'uncompleted': (
+        ojs.ReviewAssignment.date_confirmed != None,
+        ojs.ReviewAssignment.date_completed == None,
+        ojs.ReviewAssignment.date_reminded == None,
+        ojs.ReviewAssignment.declined == 0,
+        ojs.ReviewAssignment.replaced == 0,
+        ojs.ReviewAssignment.cancelled == 0,
+    ),
+}
+
+def review_reminder_query(session, reminder_type):
+    return session.query(ojs.ReviewAssignment).filter(*REVIEW_REMINDER_FILTERS[reminder_type])
+
+def add_review_reminder_details(session, review_assignments):
+    """
+    adds reviewer_settings, article_title and article_status to review assignment dicts with three queries,
+    however many assignments there are.
+    """
+    reviewer_settings = get_settings_for_owners(session, ojs.UserSetting, set(assignment['reviewer_id'] for assignment in review_assignments))
+    article_ids = set(assignment['submission_id'] for assignment in review_assignments)
+    statuses = dict(session.query(ojs.Article.article_id, ojs.Article.status).filter(ojs.Article.article_id.in_(article_ids))) if article_ids else {}
+    titles = get_settings_for_owners(session, ojs.ArticleSetting, article_ids, setting_names=['title'])
 
     for assignment in review_assignments:
-        assignment['reviewer_settings'] = get_user_settings_dict(
-            session,
-            assignment.get('reviewer').user_id
-        )
-        assignment['article'] = get_article_by_id_preview(
-            session,
-            assignment['submission_id']
-        )
-        assignment['title'] = get_article_settings(
-            session,
-            assignment['submission_id'],
-            'title'
-        )
+        assignment['reviewer_settings'] = reviewer_settings[assignment['reviewer_id']]
+        assignment['article_title'] = titles[assignment['submission_id']].get('title')
+        assignment['article_status'] = statuses.get(assignment['submission_id'])
     return review_assignments
 
+def get_review_reminder_candidates(session, reminder_type):
+    """
+    the review assignments due a reminder of reminder_type (see REVIEW_REMINDER_FILTERS) by due date, as dicts with
+    their reviewer settings, article title and article status. runs five queries.
+    """
+    return add_review_reminder_details(session, all_as_dict(review_reminder_query(session, reminder_type).order_by(ojs.ReviewAssignment.date_due)))
 
-def get_unconfirmed_reviews(session):
-    review_assignments = all_as_dict(
-        session.query(
-            ojs.ReviewAssignment
-        ).filter(
-            ojs.ReviewAssignment.date_confirmed == None,
-            ojs.ReviewAssignment.date_completed == None,
-            ojs.ReviewAssignment.date_reminded == None,
-            ojs.ReviewAssignment.declined == 0,
-            ojs.ReviewAssignment.replaced == 0,
-            ojs.ReviewAssignment.cancelled == 0
-        ).order_by(
-            ojs.ReviewAssignment.date_due
-        )
-    )
+def iter_review_reminder_candidates(session, reminder_type, batch_size=500):
+    """
+    streams get_review_reminder_candidates in review_id order, batch_size assignments at a time.
+    """
+    last_review_id = None
+    while True:
+        query = review_reminder_query(session, reminder_type)
+        if last_review_id is not None:
+            query = query.filter(ojs.ReviewAssignment.review_id > last_review_id)
+        batch = all_as_dict(query.order_by(ojs.ReviewAssignment.review_id).limit(batch_size))
+        if not batch:
+            return
+        for assignment in add_review_reminder_details(session, batch):
+            yield assignment
+        last_review_id = batch[-1]['review_id']
+
+def _reminder_review_assignments(session, reminder_type):
+    # the assignment dicts the reminder emails are built from, with the article and its title setting as objects.
+    review_assignments = get_review_reminder_candidates(session, reminder_type)
+    article_ids = set(assignment['submission_id'] for assignment in review_assignments)
+    articles, titles = {}, {}
+    if article_ids:
+        for article in session.query(ojs.Article).filter(ojs.Article.article_id.in_(article_ids)):
+            articles.setdefault(article.article_id, article)
+        for setting in session.query(ojs.ArticleSetting).filter(ojs.ArticleSetting.article_id.in_(article_ids), ojs.ArticleSetting.setting_name == 'title'):
+            titles.setdefault(setting.article_id, setting)
 
     for assignment in review_assignments:
-        assignment['reviewer_settings'] = get_user_settings_dict(
-            session,
-            assignment.get('reviewer').user_id
-        )
-        assignment['article'] = get_article_by_id_preview(
-            session,
-            assignment['submission_id']
-        )
-        assignment['title'] = get_article_settings(
-            session,
-            assignment['submission_id'],
-            'title'
-        )
+        assignment['article'] = articles.get(assignment['submission_id'])
+        assignment['title'] = titles.get(assignment['submission_id'])
     return review_assignments
 
-def get_uncompleted_reviews(session):
-    review_assignments = all_as_dict(
-        session.query(
-            ojs.ReviewAssignment
-        ).filter(
-            ojs.ReviewAssignment.date_confirmed != None,
-            ojs.ReviewAssignment.date_completed == None,
-            ojs.ReviewAssignment.date_reminded == None,
-            ojs.ReviewAssignment.declined == 0,
-            ojs.ReviewAssignment.replaced == 0,
-            ojs.ReviewAssignment.cancelled == 0
-        ).order_by(
-            ojs.ReviewAssignment.date_due
-        )
-    )
+def get_incomplete_review_details(session):
+    return _reminder_review_assignments(session, 'incomplete')
 
-    for assignment in review_assignments:
-        assignment['reviewer_settings'] = get_user_settings_dict(
-            session,
-            assignment.get('reviewer').user_id
-        )
-        assignment['article'] = get_article_by_id_preview(
-            session,
-            assignment['submission_id']
-        )
-        assignment['title'] = get_article_settings(
-            session,
-            assignment['submission_id'],
-            'title'
-        )
-    return review_assignments
+def get_unconfirmed_reviews(session):
+    return _reminder_review_assignments(session, 'unconfirmed')
 
+def get_uncompleted_reviews(session):
+    return _reminder_review_assignments(session, 'uncompleted')
 
 def get_access_key(session, review_id):
     """Return the earliest access key entry for the given review."""
@@ -1301,26 +3031,9 @@ def add_collection(session, data):
     return new_collection
 
 def update_or_create_journal_setting(session, setting_name, setting_value, locale='en_US', setting_type='string', journal_id=1):
-
-    try:
-        setting = session.query(ojs.JournalSetting).filter(ojs.JournalSetting.journal_id == journal_id, ojs.JournalSetting.setting_name == setting_name).one()
-        setattr(setting, 'setting_value', setting_value)
-        session.flush()
-        return setting
-
-    except NoResultFound:
-        kwargs = {
-                'journal_id': journal_id,
-                'setting_name': setting_name,
-                'setting_value': setting_value,
-                'locale': locale,
-                'setting_type': setting_type,
-            }
-        new_setting = ojs.JournalSetting(**kwargs)
-        session.add(new_setting)
-        session.flush()
-
-    return new_setting
+    write_settings(session, ojs.JournalSetting, settings_rows('journal_id', {journal_id: {setting_name: setting_value}}, locale, setting_type))
+    after_transaction(session, lambda: invalidate_journal_settings(session, journal_id))
+    return get_owner_setting(session, ojs.JournalSetting, journal_id, setting_name, locale)
 
 def create_section(session, section_dict):
     new_section = ojs.Section(**section_dict)
@@ -1346,11 +3059,41 @@ def insert_email_log(session, log_dict):
     session.add(new_entry)
     session.flush()
 
+def insert_email_logs(session, log_dicts):
+    """
+    inserts email_log rows with multi-row INSERTs, returns their log_ids in input order.
+    """
+    return insert_returning_ids(session, ojs.EmailLog.log_id, log_dicts)
+
 def mark_reminder_sent(session, review_id, date_sent):
-    assignment = session.query(ojs.ReviewAssignment).filter(ojs.ReviewAssignment.review_id == review_id).one()
-    setattr(assignment, 'date_reminded', date_sent)
-    setattr(assignment, 'reminder_was_automatic', 1)
-    session.flush()
+    if not mark_reminders_sent(session, [(review_id, date_sent)])['updated']:
+        raise NoResultFound('No review assignment %s' % review_id)
+
+def mark_reminders_sent(session, reminders, chunk_size=500):
+    """
+    sets date_reminded for [(review_id, date_sent)] with one UPDATE per chunk of review ids.
+    returns {'updated': [review_id], 'missing': [review_id]}.
+    """
+    dates = collections.OrderedDict(reminders)
+    review_ids = list(dates)
+    found = set()
+    for start in xrange(0, len(review_ids), chunk_size):
+        chunk = review_ids[start:start + chunk_size]
+        found.update(row.review_id for row in session.query(ojs.ReviewAssignment.review_id).filter(ojs.ReviewAssignment.review_id.in_(chunk)))
+        session.query(ojs.ReviewAssignment).filter(ojs.ReviewAssignment.review_id.in_(chunk)).update({
+            ojs.ReviewAssignment.date_reminded: case(dict((review_id, dates[review_id]) for review_id in chunk), value=ojs.ReviewAssignment.review_id),
+            ojs.ReviewAssignment.reminder_was_automatic: 1,
+        }, synchronize_session=False)
+
+    # keep review assignments already loaded in the session in step with the update
+    for assignment in session.identity_map.values():
+        if isinstance(assignment, ojs.ReviewAssignment) and assignment.review_id in found:
+            session.expire(assignment, ['date_reminded', 'reminder_was_automatic'])
+
+    return {
+        'updated': [review_id for review_id in review_ids if review_id in found],
+        'missing': [review_id for review_id in review_ids if review_id not in found],
+    }
 
 
 def add_access_key(session, reviewer_id, review_id, new_key_hash):
@@ -1374,3 +3117,36 @@ def add_access_key(session, reviewer_id, review_id, new_key_hash):
     session.add(new_access_key_entry)
     session.flush()
     return new_access_key_entry
+
+def add_access_keys(session, access_keys):
+    """Add new access keys for many reviews with multi-row INSERTs.
+
+    Params:
+        access_keys: list of (reviewer_id, review_id, new_key_hash).
+
+    Returns:
+        The new access_key_ids, in input order.
+    """
+    expiry_date = datetime.now() + timedelta(weeks=12)
+    return insert_returning_ids(session, ojs.AccessKey.access_key_id, [
+        {
+            'context': 'ReviewerContext',
+            'key_hash': new_key_hash,
+            'user_id': reviewer_id,
+            'assoc_id': review_id,
+            'expiry_date': expiry_date,
+        }
+        for reviewer_id, review_id, new_key_hash in access_keys
+    ])
+
+def record_review_reminders(session, reminders, access_keys=(), email_logs=()):
+    """
+    the bookkeeping of a reminder run in one transaction: marks [(review_id, date_sent)] reminded, adds
+    [(reviewer_id, review_id, key_hash)] access keys and inserts the email_log rows, then commits.
+    returns the mark_reminders_sent report with 'access_key_ids' and 'email_log_ids' added.
+    """
+    report = mark_reminders_sent(session, reminders)
+    report['access_key_ids'] = add_access_keys(session, access_keys)
+    report['email_log_ids'] = insert_email_logs(session, list(email_logs))
+    session.commit()
+    return report
@@ -1,15 +1,21 @@
+import argparse
+import json
 import logging
 import os
-import sys
+import threading
+import time
+
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
 
 from sqlalchemy.ext.automap import automap_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, MetaData, inspect, Table, Column, Boolean, DateTime, Float, Integer
+from sqlalchemy import create_engine, MetaData, and_, or_, func, inspect, select, text, Table, Column, Boolean, DateTime, Float, Integer
 from sqlalchemy.types import TIMESTAMP as POSTGRES_TIMESTAMP, TEXT as POSTGRES_TEXT, VARCHAR as POSTGRES_VARCHAR
 from sqlalchemy.dialects.postgresql import BIT as POSTGRES_BIT
 from sqlalchemy.dialects.mysql.base import TINYINT, VARCHAR, DATETIME, TIMESTAMP, DOUBLE, TEXT, BIT, LONGTEXT
 from sqlalchemy.ext.declarative import declarative_base
 
+from psycopg2.extras import execute_values
 from sshtunnel import SSHTunnelForwarder
 
 
@@ -63,26 +69,26 @@ def copy_table_schemas_to_postgresdb(mysql_metadata, postgres_engine):
         table = Table(klass.name, postgres_engine._metadata)
         for column in klass.columns:
             if isinstance(column.type, TEXT):
-                table.append_column(Column(column.name, POSTGRES_TEXT(collation=''), nullable=column.nullable))
+                table.append_column(Column(column.name, POSTGRES_TEXT(collation=''), nullable=column.nullable, primary_key=column.primary_key))
             elif isinstance(column.type, VARCHAR):
-                table.append_column(Column(column.name, POSTGRES_VARCHAR(length=column.type.length, collation=''), nullable=column.nullable))
+                table.append_column(Column(column.name, POSTGRES_VARCHAR(length=column.type.length, collation=''), nullable=column.nullable, primary_key=column.primary_key))
             elif isinstance(column.type, TINYINT):
-                table.append_column(Column(column.name, Boolean(), nullable=column.nullable))
+                table.append_column(Column(column.name, Boolean(), nullable=column.nullable, primary_key=column.primary_key))
             elif isinstance(column.type, DATETIME):
-                table.append_column(Column(column.name, DateTime(), nullable=column.nullable))
+                table.append_column(Column(column.name, DateTime(), nullable=column.nullable, primary_key=column.primary_key))
             elif isinstance(column.type, TIMESTAMP):
-                table.append_column(Column(column.name, POSTGRES_TIMESTAMP(), nullable=column.nullable))
+                table.append_column(Column(column.name, POSTGRES_TIMESTAMP(), nullable=column.nullable, primary_key=column.primary_key))
             elif isinstance(column.type, DOUBLE):
-                table.append_column(Column(column.name, Float(), nullable=column.nullable))
+                table.append_column(Column(column.name, Float(), nullable=column.nullable, primary_key=column.primary_key))
             elif isinstance(column.type, BIT):
-                table.append_column(Column(column.name, POSTGRES_BIT(length=column.type.length), nullable=column.nullable))
+                table.append_column(Column(column.name, POSTGRES_BIT(length=column.type.length), nullable=column.nullable, primary_key=column.primary_key))
             elif isinstance(column.type, LONGTEXT):
-                table.append_column(Column(column.name, POSTGRES_TEXT(collation=''), nullable=column.nullable))
+                table.append_column(Column(column.name, POSTGRES_TEXT(collation=''), nullable=column.nullable, primary_key=column.primary_key))
             else:
                 table.append_column(column.copy())
                 
         print 'create', table.name
-        table.create()
+        table.create(checkfirst=True)
 
 def quick_mapper(table):
     Base = declarative_base()
@@ -107,64 +113,571 @@ def quick_mapper(table):
 
     return GenericMapper
     
-def copy_table_data_to_postgresdb(mysql_metadata, mysql_engine, postgres_engine):
-    PostgresSession = sessionmaker(bind=postgres_engine, autoflush=False)
-    postgres_session = PostgresSession()
-    MySQLSession = sessionmaker(bind=mysql_engine)
-    mysql_session = MySQLSession()
-    
-    for name, klass in mysql_metadata.tables.items():
-        print 'copy', klass.name
-        dest_table = Table(klass.name, MetaData(bind=postgres_engine), autoload=True)
-        dest_columns = dest_table.columns.keys()
-    
-        table = Table(klass.name, MetaData(bind=mysql_engine), autoload=True)
-        NewRecord = quick_mapper(table)
-
-        for record in mysql_session.query(table).all():
-            data = {}
-            for column in dest_columns:
-                value = getattr(record, column)
-                if isinstance(table.columns[column].type, TINYINT):
-                    value = bool(value)
-                elif isinstance(value, str):
-                    value = value.decode('latin8')
-                    
-                data[str(column)] = value
-            postgres_session.merge(NewRecord(**data))
-        postgres_session.commit()
+def column_converters(table, columns, encoding='latin8'):
+    """Build one converter per column, chosen once from the column type."""
+    def to_bool(value):
+        return None if value is None else bool(value)
 
-    
-    
-def copy_from_mysqldb_to_postgresdb(db_name, from_host, to_host):
-    with Tunnel(from_host, 22, '', host, port) as tunnel:
-        mysql_engine = create_engine(
-            'mysql+pymysql://{}:{}@{}:{}/{}'.format(
-                username,
-                password,
-                localhost,
-                tunnel.get_local_bind_port(),
-                db_name
-            )
+    def to_text(value):
+        return value.decode(encoding) if isinstance(value, str) else value
+
+    converters = []
+    for column in columns:
+        if isinstance(table.columns[column].type, TINYINT):
+            converters.append(to_bool)
+        else:
+            converters.append(to_text)
+    return converters
+
+
+def convert_batch(rows, converters):
+    """Convert a batch of rows column by column and return it as rows again."""
+    if not rows:
+        return rows
+    columns = zip(*rows)
+    return zip(*[map(convert, values) for convert, values in zip(converters, columns)])
+
+
+def stream_table_rows(mysql_engine, table, columns, batch_size, whereclause=None):
+    """Yield lists of row tuples read through an unbuffered server side cursor."""
+    connection = mysql_engine.connect().execution_options(stream_results=True)
+    try:
+        result = connection.execute(select([table.columns[column] for column in columns], whereclause))
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [tuple(row) for row in rows]
+    finally:
+        connection.close()
+
+
+def copy_value(value):
+    """Format a value as a COPY CSV field.
+
+    Strings are always quoted so empty strings survive, while None is left as
+    an unquoted empty field, which COPY reads back as NULL.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    if isinstance(value, str):
+        return '"{}"'.format(value.replace('"', '""'))
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def copy_rows(cursor, table_name, columns, rows, preparer):
+    """Write rows with COPY FROM STDIN in CSV format."""
+    data = StringIO()
+    for row in rows:
+        data.write(','.join(copy_value(value) for value in row))
+        data.write('\n')
+    data.seek(0)
+    cursor.copy_expert(
+        'COPY {} ({}) FROM STDIN WITH CSV'.format(
+            preparer.quote(table_name),
+            ', '.join(preparer.quote(column) for column in columns)
+        ),
+        data
+    )
+
+
+class JsonStateFile(object):
+    """Per-table state kept in a local JSON file shared by worker threads.
+
+    The file is rewritten atomically on every save, so the process can be
+    killed at any point without losing what was already recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as state_file:
+                self._state = json.load(state_file)
+        else:
+            self._state = {'tables': {}}
+
+    def _table(self, table_name):
+        return self._state['tables'].setdefault(table_name, self._new_table())
+
+    def _new_table(self):
+        return {}
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._state = {'tables': {}}
+            self._save()
+
+    def _save(self):
+        temp_path = '{}.tmp'.format(self.path)
+        with open(temp_path, 'w') as state_file:
+            json.dump(self._state, state_file)
+        os.rename(temp_path, self.path)
+
+
+class Checkpoint(JsonStateFile):
+    """Record finished tables and primary key chunks of a migration."""
+
+    def _new_table(self):
+        return {'done': False, 'chunks': []}
+
+    def is_table_done(self, table_name):
+        with self._lock:
+            return self._table(table_name)['done']
+
+    def is_chunk_done(self, table_name, chunk):
+        with self._lock:
+            return list(chunk) in self._table(table_name)['chunks']
+
+    def mark_chunk_done(self, table_name, chunk):
+        with self._lock:
+            self._table(table_name)['chunks'].append(list(chunk))
+            self._save()
+
+    def mark_table_done(self, table_name):
+        with self._lock:
+            self._table(table_name)['done'] = True
+            self._save()
+
+
+def integer_primary_key(table):
+    """Return the table's primary key column if it is a single integer, else None."""
+    columns = list(table.primary_key.columns)
+    if len(columns) == 1 and isinstance(columns[0].type, Integer):
+        return columns[0]
+    return None
+
+
+def primary_key_chunks(mysql_engine, pk_column, chunk_size):
+    """Yield (low, high) ranges, high exclusive, that cover the primary key values."""
+    low, high = mysql_engine.execute(select([func.min(pk_column), func.max(pk_column)])).first()
+    if low is None:
+        return
+    for start in xrange(low, high + 1, chunk_size):
+        yield start, start + chunk_size
+
+
+def write_rows(cursor, table_name, columns, rows, preparer, method, page_size=1000):
+    """Write rows with COPY, or with INSERTs of page_size rows each for method='insert'.
+
+    psycopg2's executemany runs one INSERT per row, execute_values sends
+    real multi-row INSERT ... VALUES statements.
+    """
+    if method == 'copy':
+        copy_rows(cursor, table_name, columns, rows, preparer)
+    else:
+        execute_values(
+            cursor,
+            'INSERT INTO {} ({}) VALUES %s'.format(
+                preparer.quote(table_name),
+                ', '.join(preparer.quote(column) for column in columns)
+            ),
+            rows,
+            page_size=page_size
         )
 
-        postgres_engine = create_engine(
-            'postgresql+psycopg2://{}:{}@{}/{}'.format(
-                'ojs',
-                'ojs',
-                to_host,
-                'ojs'
+
+def copy_rows_in_range(table, mysql_engine, postgres_engine, dest_columns, converters, batch_size, method, chunk=None, pk_column=None, replace=False):
+    """Copy the rows of a table, or of one primary key range, in one transaction.
+
+    For a range, the destination rows in that range are deleted first, so a
+    chunk that was committed but not yet recorded is simply copied again.
+    With replace, the whole destination table is emptied first, in the same
+    transaction, so a failed copy leaves the old rows in place.
+    """
+    preparer = postgres_engine.dialect.identifier_preparer
+    whereclause = None
+    if chunk is not None:
+        whereclause = and_(pk_column >= chunk[0], pk_column < chunk[1])
+
+    row_count = 0
+    postgres_connection = postgres_engine.raw_connection()
+    try:
+        cursor = postgres_connection.cursor()
+        if replace:
+            cursor.execute('DELETE FROM {}'.format(preparer.quote(table.name)))
+        if chunk is not None:
+            cursor.execute(
+                'DELETE FROM {} WHERE {} >= %s AND {} < %s'.format(
+                    preparer.quote(table.name),
+                    preparer.quote(pk_column.name),
+                    preparer.quote(pk_column.name)
+                ),
+                chunk
             )
+        for rows in stream_table_rows(mysql_engine, table, dest_columns, batch_size, whereclause):
+            write_rows(cursor, table.name, dest_columns, convert_batch(rows, converters), preparer, method)
+            row_count += len(rows)
+        postgres_connection.commit()
+    finally:
+        postgres_connection.close()
+    return row_count
+
+
+def copy_table_data(table, mysql_engine, postgres_engine, batch_size=10000, method='copy', encoding='latin8', checkpoint=None, chunk_size=100000):
+    """Copy one table's rows from MySQL into its PostgreSQL table.
+
+    Rows are streamed out of MySQL batch_size at a time, converted column by
+    column and written with COPY FROM STDIN (method='copy') or multi-row
+    INSERTs (method='insert'). Each call checks out its own
+    MySQL and PostgreSQL connections.
+
+    With a Checkpoint, finished tables are skipped and tables with a single
+    integer primary key are copied in chunk_size ranges that are recorded as
+    they commit, so an interrupted copy resumes from the first unfinished
+    range. Other tables are recopied whole until they finish. Returns
+    (rows, seconds).
+    """
+    if checkpoint is not None and checkpoint.is_table_done(table.name):
+        print 'skip', table.name
+        return 0, 0.0
+
+    print 'copy', table.name
+    started = time.time()
+    dest_table = Table(table.name, MetaData(bind=postgres_engine), autoload=True)
+    dest_columns = dest_table.columns.keys()
+    converters = column_converters(table, dest_columns, encoding)
+    pk_column = integer_primary_key(table)
+
+    row_count = 0
+    if checkpoint is None:
+        row_count = copy_rows_in_range(table, mysql_engine, postgres_engine, dest_columns, converters, batch_size, method)
+    elif pk_column is None:
+        row_count = copy_rows_in_range(table, mysql_engine, postgres_engine, dest_columns, converters, batch_size, method, replace=True)
+        checkpoint.mark_table_done(table.name)
+    else:
+        for chunk in primary_key_chunks(mysql_engine, pk_column, chunk_size):
+            if checkpoint.is_chunk_done(table.name, chunk):
+                continue
+            row_count += copy_rows_in_range(table, mysql_engine, postgres_engine, dest_columns, converters, batch_size, method, chunk, pk_column)
+            checkpoint.mark_chunk_done(table.name, chunk)
+        checkpoint.mark_table_done(table.name)
+
+    duration = time.time() - started
+    print 'copied {} rows to {} in {:.1f}s ({:.0f} rows/sec)'.format(
+        row_count, table.name, duration, row_count / duration if duration else row_count
+    )
+    return row_count, duration
+
+
+def copy_table_data_to_postgresdb(mysql_metadata, mysql_engine, postgres_engine, batch_size=10000, method='copy', encoding='latin8', checkpoint=None, chunk_size=100000):
+    """Copy every table one after another. Returns {table name: (rows, seconds)}."""
+    report = {}
+    for name, table in mysql_metadata.tables.items():
+        report[table.name] = copy_table_data(table, mysql_engine, postgres_engine, batch_size, method, encoding, checkpoint, chunk_size)
+    return report
+
+
+def get_table_sizes(mysql_engine):
+    """Return {table name: (estimated rows, data length)} from information_schema."""
+    rows = mysql_engine.execute(
+        text(
+            'SELECT table_name, table_rows, data_length '
+            'FROM information_schema.tables '
+            'WHERE table_schema = DATABASE()'
         )
+    )
+    return dict((name, (table_rows or 0, data_length or 0)) for name, table_rows, data_length in rows)
+
+
+def order_tables_by_size(mysql_metadata, mysql_engine):
+    """Return the tables largest first, so the big ones start straight away."""
+    sizes = get_table_sizes(mysql_engine)
+    return sorted(
+        mysql_metadata.tables.values(),
+        key=lambda table: sizes.get(table.name, (0, 0)),
+        reverse=True
+    )
+
+
+def copy_tables_in_parallel(mysql_metadata, mysql_engine, postgres_engine, workers=4, batch_size=10000, method='copy', encoding='latin8', checkpoint=None, chunk_size=100000):
+    """Copy tables concurrently on a pool of worker threads, largest first.
+
+    Every table is copied over its own pair of pooled connections, so the
+    engines should allow at least `workers` connections each. Prints a
+    summary of per-table durations and returns {table name: (rows, seconds)}.
+    """
+    started = time.time()
+    tables = order_tables_by_size(mysql_metadata, mysql_engine)
+
+    def copy(table):
+        return table.name, copy_table_data(table, mysql_engine, postgres_engine, batch_size, method, encoding, checkpoint, chunk_size)
+
+    pool = ThreadPool(workers)
+    try:
+        report = dict(pool.imap_unordered(copy, tables, chunksize=1))
+    finally:
+        pool.close()
+        pool.join()
+
+    print 'copied {} tables with {} workers in {:.1f}s'.format(len(report), workers, time.time() - started)
+    for name, (row_count, duration) in sorted(report.items(), key=lambda item: item[1][1], reverse=True):
+        print '{:>10.1f}s {:>12} rows  {}'.format(duration, row_count, name)
+
+    return report
+
+
+# Columns that tell which rows changed since the last sync. Tables not
+# listed here are compared with checksums.
+DELTA_COLUMNS = {
+    'articles': 'last_modified',
+    'issues': 'last_modified',
+    'event_log': 'date_logged',
+    'email_log': 'date_sent',
+    'sessions': 'last_used',
+}
+
+
+class SyncState(JsonStateFile):
+    """Remember the MySQL checksum of every primary key range that was synced."""
+
+    def get_checksums(self, table_name):
+        with self._lock:
+            return dict(self._table(table_name))
+
+    def set_checksums(self, table_name, checksums):
+        with self._lock:
+            self._table(table_name).update(checksums)
+            self._save()
+
+
+def row_checksum(table, columns):
+    """A MySQL expression hashing every column of a row, NULLs included."""
+    return func.crc32(func.concat_ws('#', *[func.ifnull(table.columns[column], '\\N') for column in columns]))
+
+
+def range_checksums(mysql_engine, table, columns, pk_column, chunk_size):
+    """Return {(low, high): (rows, checksum)} for every non empty chunk_size range.
+
+    Computed by MySQL in one grouped query, so only one row per range comes
+    back over the wire.
+    """
+    bucket = func.floor(pk_column / chunk_size).label('bucket')
+    rows = mysql_engine.execute(
+        select([bucket, func.count(), func.bit_xor(row_checksum(table, columns))]).group_by(bucket)
+    )
+    return dict(
+        ((int(bucket) * chunk_size, (int(bucket) + 1) * chunk_size), (int(count), int(checksum)))
+        for bucket, count, checksum in rows
+    )
+
+
+def table_checksum(mysql_engine, table, columns):
+    count, checksum = mysql_engine.execute(
+        select([func.count(), func.bit_xor(row_checksum(table, columns))]).select_from(table)
+    ).first()
+    return int(count), int(checksum or 0)
+
+
+def upsert_rows(cursor, table_name, columns, key_columns, rows, preparer):
+    """Write rows with INSERT ... ON CONFLICT (key_columns) DO UPDATE."""
+    update_columns = [column for column in columns if column not in key_columns]
+    if update_columns:
+        conflict_action = 'DO UPDATE SET {}'.format(
+            ', '.join('{0} = EXCLUDED.{0}'.format(preparer.quote(column)) for column in update_columns)
+        )
+    else:
+        conflict_action = 'DO NOTHING'
+
+    execute_values(
+        cursor,
+        'INSERT INTO {} ({}) VALUES %s ON CONFLICT ({}) {}'.format(
+            preparer.quote(table_name),
+            ', '.join(preparer.quote(column) for column in columns),
+            ', '.join(preparer.quote(column) for column in key_columns),
+            conflict_action
+        ),
+        rows
+    )
+
+
+def upsert_table_rows(table, mysql_engine, postgres_engine, dest_columns, key_columns, converters, batch_size, whereclause=None):
+    """Upsert the source rows matching whereclause in one transaction."""
+    preparer = postgres_engine.dialect.identifier_preparer
+    row_count = 0
+    postgres_connection = postgres_engine.raw_connection()
+    try:
+        cursor = postgres_connection.cursor()
+        for rows in stream_table_rows(mysql_engine, table, dest_columns, batch_size, whereclause):
+            upsert_rows(cursor, table.name, dest_columns, key_columns, convert_batch(rows, converters), preparer)
+            row_count += len(rows)
+        postgres_connection.commit()
+    finally:
+        postgres_connection.close()
+    return row_count
+
+
+def sync_table(table, mysql_engine, postgres_engine, state, dry_run=False, batch_size=10000, chunk_size=100000, encoding='latin8'):
+    """Bring one PostgreSQL table up to date with MySQL, copying only what changed.
+
+    Tables in DELTA_COLUMNS copy the rows whose timestamp is at or after the
+    newest one already in PostgreSQL, and the rows without a timestamp. Tables with a single integer primary
+    key copy the ranges whose MySQL checksum differs from the one stored in
+    state. Any other table is copied whole if its checksum changed. Rows are
+    upserted on the primary key, except for tables without one, which are
+    replaced in a single transaction. Rows deleted in MySQL are not removed from PostgreSQL.
+
+    Returns the number of rows copied, or that would be with dry_run.
+    """
+    started = time.time()
+    dest_table = Table(table.name, MetaData(bind=postgres_engine), autoload=True)
+    dest_columns = dest_table.columns.keys()
+    key_columns = [column.name for column in table.primary_key.columns]
+    converters = column_converters(table, dest_columns, encoding)
+
+    def copy(whereclause=None):
+        if key_columns:
+            return upsert_table_rows(table, mysql_engine, postgres_engine, dest_columns, key_columns, converters, batch_size, whereclause)
+        return copy_rows_in_range(table, mysql_engine, postgres_engine, dest_columns, converters, batch_size, 'copy', replace=True)
+
+    delta_column = DELTA_COLUMNS.get(table.name)
+    pk_column = integer_primary_key(table)
+    row_count = 0
+
+    if delta_column:
+        watermark = postgres_engine.execute(select([func.max(dest_table.columns[delta_column])])).scalar()
+        whereclause = None
+        if watermark is not None:
+            # rows without a timestamp can't be placed before or after the watermark, so they're always copied.
+            whereclause = or_(table.columns[delta_column] >= watermark, table.columns[delta_column] == None)
+        if dry_run:
+            count_query = select([func.count()]).select_from(table)
+            if whereclause is not None:
+                count_query = count_query.where(whereclause)
+            row_count = mysql_engine.execute(count_query).scalar()
+        else:
+            row_count = copy(whereclause)
+
+    elif pk_column is not None and key_columns:
+        synced = state.get_checksums(table.name)
+        current = range_checksums(mysql_engine, table, dest_columns, pk_column, chunk_size)
+        for chunk, (count, checksum) in sorted(current.items()):
+            chunk_key = '{}-{}'.format(*chunk)
+            if synced.get(chunk_key) == checksum:
+                continue
+            if dry_run:
+                row_count += count
+            else:
+                row_count += copy(and_(pk_column >= chunk[0], pk_column < chunk[1]))
+                state.set_checksums(table.name, {chunk_key: checksum})
+
+    else:
+        count, checksum = table_checksum(mysql_engine, table, dest_columns)
+        if state.get_checksums(table.name).get('all') != checksum:
+            if dry_run:
+                row_count = count
+            else:
+                row_count = copy()
+                state.set_checksums(table.name, {'all': checksum})
+
+    print '{} {} rows for {} in {:.1f}s'.format(
+        'would sync' if dry_run else 'synced', row_count, table.name, time.time() - started
+    )
+    return row_count
+
+
+def sync_mysqldb_to_postgresdb(mysql_metadata, mysql_engine, postgres_engine, state, dry_run=False, batch_size=10000, chunk_size=100000, encoding='latin8'):
+    """Incrementally sync every table. Returns {table name: rows}."""
+    report = {}
+    for name, table in mysql_metadata.tables.items():
+        report[table.name] = sync_table(table, mysql_engine, postgres_engine, state, dry_run, batch_size, chunk_size, encoding)
+    print '{} {} rows in total'.format('would sync' if dry_run else 'synced', sum(report.values()))
+    return report
+
+
+def create_engines(db_name, tunnel, to_host, pool_size=4):
+    mysql_engine = create_engine(
+        'mysql+pymysql://{}:{}@{}:{}/{}'.format(
+            username,
+            password,
+            localhost,
+            tunnel.get_local_bind_port(),
+            db_name
+        ),
+        pool_size=pool_size
+    )
+
+    postgres_engine = create_engine(
+        'postgresql+psycopg2://{}:{}@{}/{}'.format(
+            'ojs',
+            'ojs',
+            to_host,
+            'ojs'
+        ),
+        pool_size=pool_size
+    )
+    return mysql_engine, postgres_engine
+
+
+def default_state_path(db_name, to_host, kind):
+    """<db_name>-<to_host>-<kind>.json, so copies of a database to different hosts don't share state."""
+    return '{}-{}-{}.json'.format(db_name, to_host.replace(os.sep, '_'), kind)
+
+
+def copy_from_mysqldb_to_postgresdb(db_name, from_host, to_host, workers=4, checkpoint_path=None, reset_checkpoint=False):
+    with Tunnel(from_host, 22, '', host, port) as tunnel:
+        mysql_engine, postgres_engine = create_engines(db_name, tunnel, to_host, workers)
         
         mysql_metadata = MetaData()
         mysql_metadata.reflect(mysql_engine)
     
         copy_table_schemas_to_postgresdb(mysql_metadata, postgres_engine)
-        copy_table_data_to_postgresdb(mysql_metadata, mysql_engine, postgres_engine)
+        checkpoint = Checkpoint(checkpoint_path or default_state_path(db_name, to_host, 'migration'))
+        if reset_checkpoint:
+            checkpoint.reset()
+        copy_tables_in_parallel(mysql_metadata, mysql_engine, postgres_engine, workers, checkpoint=checkpoint)
+
+
+def sync_from_mysqldb_to_postgresdb(db_name, from_host, to_host, dry_run=False, state_path=None):
+    with Tunnel(from_host, 22, '', host, port) as tunnel:
+        mysql_engine, postgres_engine = create_engines(db_name, tunnel, to_host)
+
+        mysql_metadata = MetaData()
+        mysql_metadata.reflect(mysql_engine)
+
+        copy_table_schemas_to_postgresdb(mysql_metadata, postgres_engine)
+        state = SyncState(state_path or default_state_path(db_name, to_host, 'sync'))
+        return sync_mysqldb_to_postgresdb(mysql_metadata, mysql_engine, postgres_engine, state, dry_run)
     
 
     
 
 if __name__ == '__main__':
-    copy_from_mysqldb_to_postgresdb(sys.argv[1], 'dbfs-1.uplabs0.com', sys.argv[2])
+    parser = argparse.ArgumentParser(description='Copy an OJS database from MySQL to PostgreSQL.')
+    parser.add_argument('db_name')
+    parser.add_argument('to_host')
+    parser.add_argument('workers', nargs='?', type=int, default=4)
+    parser.add_argument('--checkpoint', dest='checkpoint_path', help='checkpoint file, <db_name>-<to_host>-migration.json by default')
+    parser.add_argument('--reset-checkpoint', action='store_true', help='start over, copying every table again')
+    parser.add_argument('--sync', action='store_true', help='copy only the rows changed since the last sync instead of every table')
+    parser.add_argument('--dry-run', action='store_true', help='with --sync, count the rows that would be synced without writing them')
+    parser.add_argument('--state', dest='state_path', help='sync state file, <db_name>-<to_host>-sync.json by default')
+    args = parser.parse_args()
+
+    if args.dry_run and not args.sync:
+        parser.error('--dry-run only applies to --sync')
+
+    if args.sync:
+        sync_from_mysqldb_to_postgresdb(
+            args.db_name,
+            'dbfs-1.uplabs0.com',
+            args.to_host,
+            dry_run=args.dry_run,
+            state_path=args.state_path
+        )
+    else:
+        copy_from_mysqldb_to_postgresdb(
+            args.db_name,
+            'dbfs-1.uplabs0.com',
+            args.to_host,
+            args.workers,
+            checkpoint_path=args.checkpoint_path,
+            reset_checkpoint=args.reset_checkpoint
+        )
@@ -1958,3 +1958,73 @@ class TaxonomyArticle(Base):
         "Taxonomy",
         backref="taxonomy_id",
         lazy='joined')
+
+
+class PublishedArticleIndex(Base):
+    # Not part of the OJS schema: a denormalised row per published article,
+    # maintained by ojssqla.logic (see rebuild_published_article_index).
+    __tablename__ = 'ojssqla_published_article_index'
+    __table_args__ = (
+        Index(
+            'ojssqla_pai_date_published',
+            'date_published',
+            'published_article_id',
+            'issue_date_published',
+            'article_id',
+        ),
+        Index(
+            'ojssqla_pai_section',
+            'section_id',
+            'date_published',
+            'published_article_id',
+            'article_id',
+        ),
+        Index(
+            'ojssqla_pai_issue',
+            'issue_id',
+            'seq',
+            'article_id',
+        ),
+        Index('ojssqla_pai_doi', 'doi'),
+        Index('ojssqla_pai_publisher_id', 'publisher_id'),
+    )
+
+    article_id = Column(BigInteger, primary_key=True)
+    published_article_id = Column(BigInteger, nullable=False, unique=True)
+    issue_id = Column(BigInteger, nullable=False)
+    section_id = Column(BigInteger, nullable=False)
+    journal_id = Column(BigInteger, nullable=False)
+    doi = Column(String(255))
+    publisher_id = Column(String(255))
+    title = Column(Text)
+    section_seq = Column(Float(asdecimal=True))
+    seq = Column(Float(asdecimal=True))
+    issue_volume = Column(SmallInteger)
+    issue_number = Column(String(10))
+    date_published = Column(DateTime, nullable=False)
+    issue_date_published = Column(DateTime)
+    access_status = Column(Integer)
+    issue_access_status = Column(Integer)
+    issue_open_access_date = Column(DateTime)
+
+
+class SearchTerm(Base):
+    # Not part of the OJS schema: the postings of ojssqla's full text
+    # index, maintained by ojssqla.logic (see rebuild_search_index).
+    __tablename__ = 'ojssqla_search_terms'
+    __table_args__ = (
+        Index('ojssqla_search_terms_article', 'article_id'),
+    )
+
+    term = Column(String(60), primary_key=True)
+    article_id = Column(BigInteger, primary_key=True)
+    field = Column(String(16), primary_key=True)
+    frequency = Column(Integer, nullable=False)
+
+
+class SearchDocument(Base):
+    # Weighted length of each indexed article, used for BM25 ranking.
+    __tablename__ = 'ojssqla_search_documents'
+
+    article_id = Column(BigInteger, primary_key=True)
+    length = Column(Integer, nullable=False)
@@ -16,33 +16,11 @@ from phpserialize import *
 # utils
 #
 
-def as_dict(obj):
-		"""
-		returns a dictionary instead of an object. probably quite expensive, but very convenient for caching.
-		"""
-		x = {}
-		if not obj:
-				return x
-		valid_keys = filter(lambda k: not k.startswith('_'), obj.__dict__.keys())
-		for key in valid_keys:
-				val = getattr(obj, key)
-				if isinstance(val, list):
-						x[key] = [as_dict(row) for row in val]
-				else:
-						x[key] = val
-		return x
-
-def all_as_dict(obj_list):
-		return [as_dict(obj) for obj in obj_list]
+as_dict = logic.as_dict
+all_as_dict = logic.all_as_dict
 
 def dict_ojs_settings_results(settings_results):
-	results_dict = {}
-
-	for row in settings_results:
-		results_dict[row.setting_name.replace('-', '_').replace('::', '_')] = row.setting_value
-		#results_dict[row.setting_name] = row.setting_value
-
-	return results_dict
+	return logic.resolve_settings(settings_results, decode_doi=False)
 
 def deltadate(days, start_date=None):
 
@@ -139,66 +117,93 @@ def get_author_settings(session, authors):
 		author['settings'] = dict_ojs_settings_results(session.query(ojs.AuthorSetting).filter(ojs.AuthorSetting.author_id == author.get('author_id')))
 	return authors
 
-def get_articles(session):
+def chunks(items, chunk_size):
+	for start in xrange(0, len(items), chunk_size):
+		yield items[start:start + chunk_size]
 
-	articles = all_as_dict(session.query(ojs.Article).join(ojs.Section).filter(ojs.Article.date_submitted != None))
+def get_articles_events(session, article_ids):
+	events = collections.defaultdict(list)
+	for event in session.query(ojs.EventLog).filter(ojs.EventLog.assoc_id.in_(article_ids), ojs.EventLog.assoc_type == 257):
+		events[event.assoc_id].append(as_dict(event))
+	return events
 
-	for article in articles:
-		article['events'] = get_article_events(session, article['article_id'])
-		article['settings'] = get_article_settings(session, article['article_id'])
-		article['published_article'] = get_published_article(session, article['article_id'])
-		article['latest_rejected_decission'] = get_editor_decissions(session, article['article_id'], 4)
-		article['latest_accepted_decission'] = get_editor_decissions(session, article['article_id'], 1)
-		article['authors'] = get_author_settings(session, article['authors'])
+def get_published_articles(session, article_ids):
+	return dict((published.article_id, as_dict(published)) for published in session.query(ojs.PublishedArticle).filter(ojs.PublishedArticle.article_id.in_(article_ids)))
+
+def get_latest_editor_decissions(session, article_ids, decisions_to_get):
+	latest = {}
+	decisions = session.query(
+		ojs.EditDecision
+	).filter(
+		ojs.EditDecision.article_id.in_(article_ids),
+		ojs.EditDecision.decision.in_(decisions_to_get)
+	).order_by(
+		desc(ojs.EditDecision.edit_decision_id)
+	)
+
+	for decision in decisions:
+		key = (decision.article_id, decision.decision)
+		if key not in latest:
+			latest[key] = as_dict(decision)
+	return latest
+
+def add_article_details(session, articles, chunk_size=500):
+	"""
+	Fills in events, settings, published article, latest decisions and author
+	settings for a list of article dicts, with one query per collection for
+	every chunk_size articles rather than six queries per article.
+	"""
+	for chunk in chunks(articles, chunk_size):
+		article_ids = [article['article_id'] for article in chunk]
+		author_ids = [author['author_id'] for article in chunk for author in article['authors']]
+
+		events = get_articles_events(session, article_ids)
+		settings = logic.get_settings_for_owners(session, ojs.ArticleSetting, article_ids, decode_doi=False)
+		published_articles = get_published_articles(session, article_ids)
+		decissions = get_latest_editor_decissions(session, article_ids, [1, 4])
+		author_settings = logic.get_settings_for_owners(session, ojs.AuthorSetting, author_ids, decode_doi=False)
+
+		for article in chunk:
+			article_id = article['article_id']
+			article['events'] = events[article_id]
+			article['settings'] = settings[article_id]
+			article['published_article'] = published_articles.get(article_id)
+			article['latest_rejected_decission'] = decissions.get((article_id, 4), {})
+			article['latest_accepted_decission'] = decissions.get((article_id, 1), {})
+			for author in article['authors']:
+				author['settings'] = author_settings[author['author_id']]
 
 	return articles
 
+def articles_query(session):
+	return session.query(ojs.Article).join(ojs.Section).filter(ojs.Article.date_submitted != None)
+
+def modified_articles_query(session):
+	date = deltadate(28)
+	return session.query(
+		ojs.Article
+	).outerjoin(
+		ojs.PublishedArticle
+	).join(
+		ojs.Section
+	).filter(
+		(ojs.Article.date_submitted >= date) |
+		(ojs.Article.last_modified >= date) |
+		(ojs.PublishedArticle.date_published >= date)
+	)
+
+def get_articles(session, chunk_size=500):
+
+	articles = all_as_dict(articles_query(session))
+
+	return add_article_details(session, articles, chunk_size)
+
 
-def get_modified_articles(session):
-
-    date = deltadate(28)
-    articles = all_as_dict(
-        session.query(
-            ojs.Article
-        ).outerjoin(
-            ojs.PublishedArticle
-        ).join(
-            ojs.Section
-        ).filter(
-            (ojs.Article.date_submitted >= date) |
-            (ojs.Article.last_modified >= date) |
-            (ojs.PublishedArticle.date_published >= date)
-        )
-    )
-
-    for article in articles:
-        article['events'] = get_article_events(
-            session, article['article_id']
-        )
-        article['settings'] = get_article_settings(
-            session,
-            article['article_id']
-        )
-        article['published_article'] = get_published_article(
-            session,
-            article['article_id']
-        )
-        article['latest_rejected_decission'] = get_editor_decissions(
-            session,
-            article['article_id'],
-            4
-        )
-        article['latest_accepted_decission'] = get_editor_decissions(
-            session,
-            article['article_id'],
-            1
-        )
-        article['authors'] = get_author_settings(
-            session,
-            article['authors']
-        )
-
-    return articles
+def get_modified_articles(session, chunk_size=500):
+
+	articles = all_as_dict(modified_articles_query(session))
+
+	return add_article_details(session, articles, chunk_size)
 
 def get_article_settings(session, article_id):
 	return dict_ojs_settings_results(session.query(ojs.ArticleSetting).filter(ojs.ArticleSetting.article_id == article_id))
@@ -216,14 +221,71 @@ def get_revi_assignments(session, article_id):
 	return all_as_dict(session.query(ojs.ReviewAssignment).filter(ojs.ReviewAssignment.submission_id == article_id))
 
 def get_issues(session):
-	issues = all_as_dict(session.query(ojs.Issue))
-	for issue in issues:
-	 	issue['title'] = as_dict(session.query(ojs.IssueSettings).filter(ojs.IssueSettings.issue_id == issue.get('issue_id'), ojs.IssueSettings.setting_name == 'title')).get('setting_value')
-	 	issue['description'] = as_dict(session.query(ojs.IssueSettings).filter(ojs.IssueSettings.issue_id == issue.get('issue_id'), ojs.IssueSettings.setting_name == 'description')).get('setting_value')
-	 	issue.pop('journal_id')
-	return issues
+	return list(iter_issues(session))
 
 
 def get_article_keywords_list(session, article_id):
 
 	return session.query(ojs.ArticleSetting.setting_value).filter(ojs.ArticleSetting.article_id == article_id, ojs.ArticleSetting.setting_name == 'subject').first()
+
+
+#
+# Streaming exports
+#
+
+def keyset_batches(query, pk_column, batch_size=500):
+	"""
+	Yields the rows of query in lists of at most batch_size, paging on
+	pk_column > last seen value rather than OFFSET so every page is an
+	index range scan and only one page is held at a time.
+	"""
+	last_seen = None
+	while True:
+		page = query
+		if last_seen is not None:
+			page = page.filter(pk_column > last_seen)
+		batch = page.order_by(pk_column).limit(batch_size).all()
+		if not batch:
+			return
+		yield batch
+		last_seen = getattr(batch[-1], pk_column.key)
+
+def iter_articles(session, batch_size=500, modified_only=False):
+	"""
+	Generator version of get_articles / get_modified_articles yielding one
+	fully assembled article dict at a time.
+	"""
+	query = modified_articles_query(session) if modified_only else articles_query(session)
+	for batch in keyset_batches(query, ojs.Article.article_id, batch_size):
+		for article in add_article_details(session, all_as_dict(batch), batch_size):
+			yield article
+
+def iter_journal_users(session, scrape_type=None, batch_size=500):
+	"""
+	Generator version of get_journal_users. Roles come from the User
+	mapper's joined load and settings are fetched once per batch.
+	"""
+	query = session.query(ojs.User)
+	if scrape_type == 'latest':
+		query = query.filter(ojs.User.date_last_login >= deltadate(days=30))
+
+	for batch in keyset_batches(query, ojs.User.user_id, batch_size):
+		users = all_as_dict(batch)
+		settings = logic.get_settings_for_owners(session, ojs.UserSetting, [user['user_id'] for user in users], decode_doi=False)
+		for user in users:
+			user['settings'] = settings[user['user_id']]
+			yield user
+
+def iter_issues(session, batch_size=500):
+	"""
+	Generator version of get_issues, with the title and description
+	settings of each batch fetched in one query.
+	"""
+	for batch in keyset_batches(session.query(ojs.Issue), ojs.Issue.issue_id, batch_size):
+		issues = all_as_dict(batch)
+		settings = logic.get_settings_for_owners(session, ojs.IssueSettings, [issue['issue_id'] for issue in issues], setting_names=['title', 'description'], decode_doi=False)
+		for issue in issues:
+			issue['title'] = settings[issue['issue_id']].get('title')
+			issue['description'] = settings[issue['issue_id']].get('description')
+			issue.pop('journal_id')
+			yield issue
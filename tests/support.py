@@ -0,0 +1,70 @@
+"""
+sqlite fixtures for the logic tests and benchmarks.
+"""
+import unittest
+
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from ojssqla import ojs, logic
+
+
+@compiles(BigInteger, 'sqlite')
+def _sqlite_big_integer(element, compiler, **kw):
+    # sqlite only autoincrements INTEGER PRIMARY KEY columns.
+    return 'INTEGER'
+
+
+class QueryCounter(object):
+    """
+    counts the statements an engine executes.
+    """
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def sqlite_engine(tables):
+    """
+    an in-memory sqlite database with the named tables. the module level caches are cleared, as every sqlite://
+    database has the same cache key.
+    """
+    engine = create_engine('sqlite://')
+    ojs.metadata.create_all(engine, tables=[ojs.metadata.tables[name] for name in tables])
+    for cache in (logic.journal_settings_cache, logic.article_count_cache, logic.article_identifier_cache, logic.search_stats_cache,
+                  logic.issue_archive_cache, logic.issue_toc_cache, logic.session_cache):
+        cache.invalidate()
+    return engine
+
+
+class LogicTestCase(unittest.TestCase):
+    """
+    a fresh in-memory database with the given tables for every test. self.queries counts the statements executed.
+    """
+    tables = ()
+
+    def setUp(self):
+        self.engine = sqlite_engine(self.tables)
+        self.counter = QueryCounter(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    @property
+    def queries(self):
+        return self.counter.count
+
+    def count_queries(self, function, *args, **kwargs):
+        """
+        returns (result, number of statements function executed).
+        """
+        start = self.queries
+        result = function(*args, **kwargs)
+        return result, self.queries - start
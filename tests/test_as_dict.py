@@ -0,0 +1,57 @@
+import datetime
+
+from sqlalchemy.orm import joinedload
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+def baseline_as_dict(obj):
+    # as_dict before the per-class serializers
+    x = {}
+    if not obj:
+        return x
+    valid_keys = filter(lambda k: not k.startswith('_'), obj.__dict__.keys())
+    for key in valid_keys:
+        val = getattr(obj, key)
+        if isinstance(val, list):
+            x[key] = [baseline_as_dict(row) for row in val]
+        else:
+            x[key] = val
+    return x
+
+
+class AsDictTests(LogicTestCase):
+    tables = ('articles', 'article_settings', 'published_articles', 'issues', 'authors', 'article_galleys', 'taxonomy_article',
+              'edit_decisions', 'sections', 'article_files', 'taxonomy', 'issue_galleys')
+
+    def setUp(self):
+        super(AsDictTests, self).setUp()
+        now = datetime.datetime(2020, 6, 1)
+        self.session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                                   show_title=1, date_published=now, volume=1, number='1'))
+        for article_id in (1, 2):
+            self.session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0,
+                                         current_round=1, fast_tracked=0, hide_author=0, comments_status=0, date_submitted=now))
+            self.session.add(ojs.ArticleSetting(article_id=article_id, locale='en_US', setting_name='title', setting_value='Article %d' % article_id,
+                                                setting_type='string'))
+            self.session.add(ojs.Author(author_id=article_id, submission_id=article_id, primary_contact=1, seq=1, first_name='First',
+                                        last_name='Last', email='author@example.org'))
+        self.session.add(ojs.PublishedArticle(published_article_id=1, article_id=1, issue_id=1, seq=1, access_status=0, date_published=now))
+        self.session.commit()
+        self.session.expunge_all()
+
+    def test_matches_the_baseline_serializer(self):
+        articles = self.session.query(ojs.Article).options(
+            joinedload(ojs.Article.settings), joinedload(ojs.Article.authors), joinedload(ojs.Article.published_article)
+        ).order_by(ojs.Article.article_id).all()
+
+        self.assertEqual(logic.all_as_dict(articles), [baseline_as_dict(article) for article in articles])
+        self.assertEqual(logic.all_as_dict(articles)[0]['settings'][0]['setting_value'], 'Article 1')
+
+    def test_expired_columns_are_left_out(self):
+        article = self.session.query(ojs.Article).filter(ojs.Article.article_id == 1).one()
+        self.session.expire(article, ['status'])
+
+        self.assertEqual(logic.as_dict(article), baseline_as_dict(article))
+        self.assertNotIn('status', logic.as_dict(article))
@@ -0,0 +1,45 @@
+import datetime
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class EditorialTeamTests(LogicTestCase):
+    tables = ('groups', 'group_settings', 'group_memberships', 'users', 'user_settings', 'roles', 'user_interests', 'controlled_vocab_entries')
+
+    def add_members(self, count):
+        now = datetime.datetime.now()
+        for group_id in (1, 2, 3):
+            self.session.add(ojs.Group(group_id=group_id, publish_email=group_id % 2, seq=group_id))
+            self.session.add(ojs.GroupSettings(group_id=group_id, locale='en_US', setting_name='title', setting_value='Group %d' % group_id, setting_type='string'))
+        for user_id in range(1, count + 1):
+            self.session.add(ojs.User(user_id=user_id, username='user%d' % user_id, password='x', first_name='First', last_name='Last %d' % user_id,
+                                      email='user%d@example.org' % user_id, date_registered=now, date_last_login=now))
+            self.session.add(ojs.GroupMemberships(user_id=user_id, group_id=user_id % 3 + 1, seq=count - user_id))
+            self.session.add(ojs.UserSetting(user_id=user_id, locale='de_DE', setting_name='affiliation', setting_value='Affiliation %d' % user_id,
+                                             setting_type='string', assoc_type=0, assoc_id=0))
+            self.session.add(ojs.UserSetting(user_id=user_id, locale='en_US', setting_name='biography', setting_value='Bio %d' % user_id,
+                                             setting_type='string', assoc_type=0, assoc_id=0))
+        self.session.commit()
+
+    def test_query_count_is_constant(self):
+        counts = []
+        for count in (1, 30):
+            # a fresh database per membership size.
+            self.tearDown()
+            self.setUp()
+            self.add_members(count)
+            team, queries = self.count_queries(logic.editorial_team, self.session)
+            self.assertEqual(sum(len(members) for members in team.values()), count)
+            counts.append(queries)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_members_are_resolved(self):
+        self.add_members(6)
+        team = logic.editorial_team(self.session)
+        self.assertEqual(list(team), ['Group 1', 'Group 2', 'Group 3'])
+        member = team['Group 1'][0]
+        self.assertEqual(member['last_name'], 'Last 6')
+        self.assertEqual(member['affiliation'], 'Affiliation 6')
+        self.assertEqual(member['bio'], 'Bio 6')
+        self.assertEqual(member['display_email'], 1)
@@ -0,0 +1,70 @@
+import datetime
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class ArticleIdentifierTests(LogicTestCase):
+    tables = ('articles', 'article_settings', 'published_articles', 'issues', 'authors', 'article_galleys', 'taxonomy_article',
+              'edit_decisions', 'sections', 'article_files', 'taxonomy', 'issue_galleys')
+
+    def setUp(self):
+        super(ArticleIdentifierTests, self).setUp()
+        self.now = datetime.datetime(2020, 6, 1)
+        self.session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                                   show_title=1, date_published=self.now, volume=1, number='1'))
+        self.add_article(1, published=True)
+        self.session.commit()
+
+    def add_article(self, article_id, published):
+        self.session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0, current_round=1,
+                                     fast_tracked=0, hide_author=0, comments_status=0, date_submitted=self.now))
+        self.session.add(ojs.ArticleSetting(article_id=article_id, locale='', setting_name='pub-id::doi', setting_value='10.1/ABC.%d' % article_id,
+                                            setting_type='string'))
+        if published:
+            self.session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=1, seq=article_id,
+                                                  access_status=0, date_published=self.now))
+
+    def article_id(self, article):
+        return article.article_id if article is not None else None
+
+    def test_dois_are_case_insensitive(self):
+        self.assertEqual(self.article_id(logic.get_article(self.session, '10.1/ABC.1')), 1)
+        self.assertEqual(self.article_id(logic.get_article(self.session, '10.1/abc.1')), 1)
+
+    def test_new_article_resolves_before_the_map_expires(self):
+        logic.get_article(self.session, '10.1/ABC.1')
+        self.add_article(2, published=True)
+        self.session.commit()
+
+        self.assertEqual(self.article_id(logic.get_article(self.session, '10.1/abc.2')), 2)
+        self.assertEqual(self.article_id(logic.get_article_by_id(self.session, 2)), 2)
+
+    def test_unpublished_article_stops_resolving(self):
+        logic.get_article(self.session, '10.1/ABC.1')
+        self.session.query(ojs.PublishedArticle).delete()
+        self.session.commit()
+
+        self.assertIsNone(logic.get_article(self.session, '10.1/ABC.1'))
+        self.assertIsNone(logic.get_article_by_id(self.session, 1))
+
+    def test_unknown_identifier(self):
+        self.add_article(2, published=False)
+        self.session.commit()
+        self.assertIsNone(logic.get_article(self.session, '10.1/ABC.2'))
+        self.assertIsNone(logic.get_article(self.session, 'missing'))
+
+    def test_article_in_a_published_issue_resolves_without_its_own_date(self):
+        # get_article and get_article_by_id only ever required the issue to be published.
+        logic.get_article(self.session, '10.1/ABC.1')
+        self.add_article(2, published=True)
+        self.session.commit()
+        self.session.query(ojs.PublishedArticle).filter(ojs.PublishedArticle.article_id == 2).update({'date_published': None})
+        self.session.commit()
+
+        # through the database fallback, then the reloaded map.
+        for attempt in range(2):
+            self.assertEqual(self.article_id(logic.get_article(self.session, '10.1/abc.2')), 2)
+            self.assertEqual(self.article_id(logic.get_article_by_id(self.session, 2)), 2)
+        # the search getters still want the article's own date.
+        self.assertEqual([article.article_id for article in logic.cloud_search_articles(self.session, ['10.1/ABC.1', '10.1/ABC.2'])], [1])
@@ -0,0 +1,35 @@
+import datetime
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class IssueArchiveTests(LogicTestCase):
+    tables = ('issues', 'issue_settings', 'issue_galleys', 'article_files')
+
+    def setUp(self):
+        super(IssueArchiveTests, self).setUp()
+        # the mapped table's foreign key names a table that doesn't exist, so it is created and filled by hand.
+        orders = Table('custom_issue_orders', MetaData(), Column('issue_id', Integer, primary_key=True), Column('journal_id', Integer, primary_key=True),
+                       Column('seq', Float))
+        orders.create(self.engine)
+
+        self.session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                                   show_title=1, date_published=datetime.datetime(2020, 6, 1), volume=1, number='1'))
+        self.session.execute(orders.insert(), {'issue_id': 1, 'journal_id': 1, 'seq': 1})
+        self.session.add(ojs.IssueSettings(issue_id=1, locale='en_US', setting_name='title', setting_value='English', setting_type='string'))
+        self.session.add(ojs.IssueSettings(issue_id=1, locale='fr_CA', setting_name='title', setting_value='French', setting_type='string'))
+        self.session.commit()
+
+    def test_settings_default_to_english(self):
+        self.assertEqual(logic.build_issue_archive(self.session)['issues'][1]['settings']['title'], 'English')
+        self.assertEqual(logic.get_archive_issues_by_year(self.session, 2020)[0]['settings']['title'], 'English')
+        self.assertEqual(logic.get_archive_issues_by_year(self.session, '2020', locales=['fr_CA'])[0]['settings']['title'], 'French')
+
+    def test_years_that_are_not_dates_match_nothing(self):
+        self.assertEqual([issue.issue_id for issue in logic.get_issues_by_year(self.session, '2020')], [1])
+        for year in ('abc', None, 9999, 0, 10 ** 20):
+            self.assertEqual(logic.get_issues_by_year(self.session, year).all(), [])
+        self.assertEqual(logic.get_archive_issues_by_year(self.session, 'abc'), [])
@@ -0,0 +1,62 @@
+import datetime
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class IssueTocTests(LogicTestCase):
+    tables = ('articles', 'article_settings', 'published_articles', 'issues', 'issue_settings', 'authors', 'article_galleys', 'taxonomy_article',
+              'edit_decisions', 'sections', 'section_settings', 'custom_section_orders', 'article_files', 'taxonomy', 'issue_galleys')
+
+    def setUp(self):
+        super(IssueTocTests, self).setUp()
+        self.published = datetime.datetime(2020, 6, 1)
+        self.session.add(ojs.Section(section_id=1, journal_id=1, seq=1))
+        self.add_issue(1, date_published=self.published)
+        self.add_article(1, issue_id=1, date_published=self.published)
+        self.add_article(2, issue_id=1, date_published=None)
+        self.session.commit()
+
+    def add_issue(self, issue_id, date_published, access_status=1, open_access_date=None):
+        self.session.add(ojs.Issue(issue_id=issue_id, journal_id=1, published=int(date_published is not None), current=0, access_status=access_status,
+                                   open_access_date=open_access_date, show_volume=1, show_number=1, show_year=1, show_title=1,
+                                   date_published=date_published, volume=1, number=str(issue_id)))
+
+    def add_article(self, article_id, issue_id, date_published):
+        self.session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0, current_round=1,
+                                     fast_tracked=0, hide_author=0, comments_status=0, date_submitted=self.published))
+        self.session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=issue_id, seq=article_id,
+                                              access_status=0, date_published=date_published))
+
+    def article_ids(self, toc):
+        return [article['article_id'] for section in toc['sections'] for article in section['articles']]
+
+    def test_only_published_articles_are_listed(self):
+        toc, queries = self.count_queries(logic.get_issue_toc, self.session, 1)
+        self.assertEqual(self.article_ids(toc), [1])
+        self.assertEqual(queries, 9)
+
+    def test_unpublished_issue_has_no_toc(self):
+        self.add_issue(2, date_published=None)
+        self.add_article(3, issue_id=2, date_published=self.published)
+        self.session.commit()
+        self.assertIsNone(logic.build_issue_toc(self.session, 2))
+        self.assertIsNone(logic.get_issue_toc(self.session, 2))
+
+    def test_issues_are_hidden_until_they_are_visible(self):
+        tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+        self.add_issue(2, date_published=tomorrow)
+        self.add_issue(3, date_published=self.published, access_status=2, open_access_date=tomorrow)
+        self.session.commit()
+        self.assertIsNone(logic.get_issue_toc(self.session, 2))
+        self.assertIsNone(logic.get_issue_toc(self.session, 3))
+        self.assertTrue(logic.issue_toc_visible(logic.build_issue_toc(self.session, 3), now=tomorrow))
+
+    def test_settings_default_to_english(self):
+        self.session.add(ojs.ArticleSetting(article_id=1, locale='en_US', setting_name='title', setting_value='English', setting_type='string'))
+        self.session.add(ojs.ArticleSetting(article_id=1, locale='fr_CA', setting_name='title', setting_value='French', setting_type='string'))
+        self.session.commit()
+
+        for toc in (logic.build_issue_toc(self.session, 1), logic.get_issue_toc(self.session, 1)):
+            self.assertEqual(toc['sections'][0]['articles'][0]['settings']['title'], 'English')
+        self.assertEqual(logic.get_issue_toc(self.session, 1, ['fr_CA'])['sections'][0]['articles'][0]['settings']['title'], 'French')
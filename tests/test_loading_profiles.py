@@ -0,0 +1,56 @@
+import datetime
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class ListingProfileTests(LogicTestCase):
+    tables = ('articles', 'article_settings', 'published_articles', 'issues', 'authors', 'article_galleys', 'taxonomy_article', 'edit_decisions',
+              'sections', 'article_files', 'taxonomy', 'issue_galleys')
+
+    def add_articles(self, count):
+        now = datetime.datetime(2020, 6, 1)
+        self.session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                                   show_title=1, date_published=now, volume=1, number='1'))
+        for article_id in range(1, count + 1):
+            self.session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0,
+                                         current_round=1, fast_tracked=0, hide_author=0, comments_status=0, date_submitted=now))
+            self.session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=1, seq=article_id,
+                                                  access_status=0, date_published=now))
+            self.session.add(ojs.ArticleSetting(article_id=article_id, locale='en_US', setting_name='title', setting_value='T%d' % article_id,
+                                                setting_type='string'))
+            self.session.add(ojs.ArticleGalley(galley_id=article_id, article_id=article_id, file_id=article_id, label='PDF', html_galley=0, seq=0))
+            self.session.add(ojs.EditDecision(edit_decision_id=article_id, article_id=article_id, round=1, editor_id=1, decision=1, date_decided=now))
+        self.session.commit()
+
+    def listing(self):
+        articles = logic.get_issue_articles(self.session, 1, '1', 1).all()
+        return [([setting.setting_value for setting in article.settings], [galley.label for galley in article.galleys]) for article in articles]
+
+    def test_listing_loads_a_constant_number_of_queries(self):
+        counts = []
+        for count in (1, 20):
+            self.tearDown()
+            self.setUp()
+            self.add_articles(count)
+            listing, queries = self.count_queries(self.listing)
+            self.assertEqual(listing, [(['T%d' % article_id], ['PDF']) for article_id in range(1, count + 1)])
+            counts.append(queries)
+        # the articles with their published_article, settings, authors and galleys, and the eager loads the Issue
+        # and ArticleGalley mappers add (issue galleys and galley files).
+        self.assertEqual(counts, [6, 6])
+
+    def test_decisions_are_loaded_on_access(self):
+        self.add_articles(2)
+        articles = logic.get_issue_articles(self.session, 1, '1', 1).all()
+        self.assertEqual([len(article.decisions) for article in articles], [1, 1])
+
+    def test_galleys_can_be_read_after_the_session_closes(self):
+        self.add_articles(2)
+        articles = logic.get_issue_articles(self.session, 1, '1', 1).all()
+        self.session.close()
+        self.assertEqual([[galley.label for galley in article.galleys] for article in articles], [['PDF'], ['PDF']])
+
+    def test_detail_and_export_load_what_listing_loads(self):
+        eager = lambda profile: set(key for key, strategy in logic.ARTICLE_LOADING_PROFILES[profile].items() if strategy not in ('lazy', 'noload'))
+        self.assertTrue(eager('listing') <= eager('detail') <= eager('export'))
@@ -0,0 +1,49 @@
+import datetime
+
+from sqlalchemy import MetaData, String
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class LoginTests(LogicTestCase):
+    tables = ('roles', 'user_interests', 'controlled_vocab_entries')
+
+    def setUp(self):
+        super(LoginTests, self).setUp()
+        # usernames and emails compare case-insensitively, as with MySQL's collation.
+        users = ojs.User.__table__.tometadata(MetaData())
+        for column in (users.c.username, users.c.email):
+            column.type = String(column.type.length, collation='NOCASE')
+        users.create(self.engine)
+
+        self.add_user(1, 'alice', 'alice@example.org', 'secret')
+        self.add_user(2, 'bob', 'bob@example.org', u'p\xe9')
+        self.session.add(ojs.Roles(journal_id=1, user_id=1, role_id=16))
+        self.session.commit()
+
+    def add_user(self, user_id, username, email, password):
+        now = datetime.datetime(2020, 6, 1)
+        self.session.add(ojs.User(user_id=user_id, username=username, password=logic.hash_password(username, password), first_name='First',
+                                  last_name='Last', email=email, date_registered=now, date_last_login=now, must_change_password=0,
+                                  disabled=0, inline_help=0))
+
+    def login(self, login, password):
+        user = logic.get_login_user(self.session, login, logic.hash_password(login, password), password)
+        return user.user_id if user is not None else None
+
+    def test_username_and_email_logins(self):
+        self.assertEqual(self.login('alice', 'secret'), 1)
+        self.assertEqual(self.login('alice@example.org', 'secret'), 1)
+        self.assertEqual(self.login('bob@example.org', u'p\xe9'), 2)
+
+    def test_email_is_case_insensitive(self):
+        self.assertEqual(self.login('Alice@Example.org', 'secret'), 1)
+
+    def test_miscased_username_is_rejected(self):
+        self.assertIsNone(self.login('Alice', 'secret'))
+
+    def test_wrong_password_is_rejected(self):
+        self.assertIsNone(self.login('alice', 'wrong'))
+        self.assertIsNone(self.login('alice@example.org', 'wrong'))
+        self.assertIsNone(self.login('nobody', 'secret'))
@@ -0,0 +1,44 @@
+import datetime
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class OJSKeywordSearchTests(LogicTestCase):
+    tables = ('articles', 'published_articles', 'issues', 'authors', 'article_settings', 'article_galleys', 'taxonomy_article', 'edit_decisions',
+              'sections', 'article_files', 'taxonomy', 'issue_galleys', 'article_search_keyword_list', 'article_search_object_keywords',
+              'article_search_objects')
+
+    def setUp(self):
+        super(OJSKeywordSearchTests, self).setUp()
+        now = datetime.datetime(2020, 6, 1)
+        self.session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                                   show_title=1, date_published=now, volume=1, number='1'))
+        titles = {1: 'The history of modern science in 2019', 2: 'Science and its history', 3: 'Quantum chemistry'}
+        keyword_ids = {}
+        for article_id, title in titles.items():
+            self.session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0,
+                                         current_round=1, fast_tracked=0, hide_author=0, comments_status=0, date_submitted=now))
+            self.session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=1, seq=article_id,
+                                                  access_status=0, date_published=now))
+            self.session.add(ojs.ArticleSearchObject(object_id=article_id, article_id=article_id, type=logic.ARTICLE_SEARCH_TITLE))
+            for pos, keyword in enumerate(logic.ojs_search_keywords(title)):
+                if keyword not in keyword_ids:
+                    keyword_ids[keyword] = len(keyword_ids) + 1
+                    self.session.add(ojs.ArticleSearchKeywordList(keyword_id=keyword_ids[keyword], keyword_text=keyword))
+                self.session.execute(ojs.t_article_search_object_keywords.insert().values(object_id=article_id, keyword_id=keyword_ids[keyword], pos=pos))
+        self.session.commit()
+
+    def test_keywords_are_filtered_like_ojs(self):
+        self.assertEqual(logic.ojs_search_keywords('The history of modern science in 2019, vol. 12e3'), ['history', 'modern', 'science', 'vol'])
+        self.assertEqual(logic.ojs_search_keywords('Whereupon nevertheless quantum'), ['quantum'])
+        self.assertEqual(logic.ojs_search_keywords('hi* quant*', allow_wildcards=True), ['hi%', 'quant%'])
+
+    def test_filtered_words_are_ignored(self):
+        self.assertEqual(logic.ojs_keyword_search(self.session, 'history of science 2019'), [(1, 2), (2, 2)])
+        self.assertEqual(logic.ojs_keyword_search(self.session, '"history of modern science"'), [(1, 1)])
+        self.assertEqual(logic.ojs_keyword_search(self.session, 'the'), [])
+
+    def test_every_kept_word_must_match(self):
+        self.assertEqual(logic.ojs_keyword_search(self.session, 'quantum history'), [])
+        self.assertEqual(logic.ojs_keyword_search(self.session, 'quant*'), [(3, 1)])
@@ -0,0 +1,68 @@
+import datetime
+
+from ojssqla import ojs, scraper
+from tests.support import LogicTestCase
+
+
+class ScraperTests(LogicTestCase):
+    tables = ('articles', 'article_settings', 'published_articles', 'issues', 'issue_settings', 'authors', 'author_settings', 'article_galleys',
+              'taxonomy_article', 'edit_decisions', 'sections', 'article_files', 'taxonomy', 'issue_galleys', 'event_log')
+
+    def setUp(self):
+        super(ScraperTests, self).setUp()
+        self.now = datetime.datetime.now()
+        self.session.add(ojs.Section(section_id=1, journal_id=1, seq=1))
+        self.session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                                   show_title=1, date_published=self.now, volume=1, number='1'))
+        self.session.commit()
+
+    def add_articles(self, count):
+        for article_id in xrange(1, count + 1):
+            self.session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0,
+                                         current_round=1, fast_tracked=0, hide_author=0, comments_status=0, date_submitted=self.now))
+            self.session.add(ojs.ArticleSetting(article_id=article_id, locale='en_US', setting_name='title', setting_value='Article %d' % article_id,
+                                                setting_type='string'))
+            self.session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=1, seq=article_id,
+                                                  access_status=0, date_published=self.now))
+            self.session.add(ojs.EditDecision(edit_decision_id=article_id, article_id=article_id, round=1, editor_id=1, decision=1,
+                                              date_decided=self.now))
+            self.session.add(ojs.EventLog(log_id=article_id, assoc_type=257, assoc_id=article_id, user_id=1, date_logged=self.now,
+                                          ip_address='127.0.0.1', event_type=1))
+            self.session.add(ojs.Author(author_id=article_id, submission_id=article_id, primary_contact=1, seq=1, first_name='First',
+                                        last_name='Last', email='author@example.org'))
+            self.session.add(ojs.AuthorSetting(author_id=article_id, locale='en_US', setting_name='affiliation', setting_value='University',
+                                               setting_type='string'))
+        self.session.commit()
+        self.session.expunge_all()
+
+    def test_query_count_does_not_grow_with_the_articles(self):
+        for function in (scraper.get_articles, scraper.get_modified_articles):
+            counts = []
+            for count in (1, 30):
+                self.tearDown()
+                self.setUp()
+                self.add_articles(count)
+                articles, queries = self.count_queries(function, self.session)
+                self.assertEqual(len(articles), count)
+                counts.append(queries)
+            self.assertEqual(counts[0], counts[1], function.__name__)
+
+    def test_article_details(self):
+        self.add_articles(2)
+        article = scraper.get_articles(self.session)[1]
+        self.assertEqual(article['settings']['title'], 'Article 2')
+        self.assertEqual(article['published_article']['issue_id'], 1)
+        self.assertEqual(article['latest_accepted_decission']['edit_decision_id'], 2)
+        self.assertEqual(article['latest_rejected_decission'], {})
+        self.assertEqual([event['log_id'] for event in article['events']], [2])
+        self.assertEqual(article['authors'][0]['settings'], {'affiliation': 'University'})
+
+    def test_issues_have_their_title_and_description(self):
+        self.session.add(ojs.IssueSettings(issue_id=1, locale='en_US', setting_name='title', setting_value='Spring', setting_type='string'))
+        self.session.add(ojs.IssueSettings(issue_id=1, locale='en_US', setting_name='description', setting_value='An issue', setting_type='string'))
+        self.session.commit()
+
+        issues = scraper.get_issues(self.session)
+        self.assertEqual([(issue['title'], issue['description']) for issue in issues], [('Spring', 'An issue')])
+        self.assertNotIn('journal_id', issues[0])
+        self.assertEqual(issues, list(scraper.iter_issues(self.session)))
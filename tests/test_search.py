@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class SearchIndexTests(LogicTestCase):
+    tables = ('articles', 'article_settings', 'published_articles', 'issues', 'authors', 'article_galleys', 'taxonomy_article', 'edit_decisions',
+              'sections', 'article_files', 'taxonomy', 'issue_galleys', 'ojssqla_search_terms', 'ojssqla_search_documents')
+
+    def setUp(self):
+        super(SearchIndexTests, self).setUp()
+        now = datetime.datetime(2020, 6, 1)
+        self.session.add(ojs.Issue(issue_id=1, journal_id=1, published=1, current=1, access_status=1, show_volume=1, show_number=1, show_year=1,
+                                   show_title=1, date_published=now, volume=1, number='1'))
+        titles = {1: u'Résumé writing and the resume', 2: u'RESUME of a café'}
+        for article_id, title in titles.items():
+            self.session.add(ojs.Article(article_id=article_id, section_id=1, user_id=1, journal_id=1, status=3, submission_progress=0,
+                                         current_round=1, fast_tracked=0, hide_author=0, comments_status=0, date_submitted=now))
+            self.session.add(ojs.ArticleSetting(article_id=article_id, locale='en_US', setting_name='title', setting_value=title, setting_type='string'))
+            self.session.add(ojs.PublishedArticle(published_article_id=article_id, article_id=article_id, issue_id=1, seq=article_id,
+                                                  access_status=0, date_published=now))
+        self.session.commit()
+
+    def test_terms_are_accent_and_case_insensitive(self):
+        self.assertEqual(logic.tokenize(u'Résumé RESUME ﬁle'), [u'resume', u'resume', u'file'])
+
+        logic.rebuild_search_index(self.session)
+        terms = self.session.query(ojs.SearchTerm.term, ojs.SearchTerm.frequency).filter(ojs.SearchTerm.article_id == 1).all()
+        self.assertEqual(sorted(terms), [(u'resume', 2), (u'writing', 1)])
+        self.assertEqual(sorted(article_id for article_id, score in logic.search_articles(self.session, u'RÉSUMÉ')), [1, 2])
+        self.assertEqual([article_id for article_id, score in logic.search_articles(self.session, 'cafe')], [2])
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ojssqla import ojs, logic
+
+
+class SessionActivityTests(unittest.TestCase):
+
+    def setUp(self):
+        # file databases, so each one has its own url and so its own buffer.
+        self.directory = tempfile.mkdtemp()
+        self.sessions = []
+        for name in ('one', 'two'):
+            engine = create_engine('sqlite:///%s' % os.path.join(self.directory, '%s.db' % name))
+            ojs.metadata.create_all(engine, tables=[ojs.metadata.tables['sessions']])
+            session = sessionmaker(bind=engine)()
+            for number in range(3):
+                session.add(ojs.Sessions(session_id='s%d' % number, user_id=1, ip_address='', created=0, last_used=0, remember=0))
+            session.commit()
+            self.sessions.append(session)
+        self.activity = logic.SessionActivity(maxsize=2)
+
+    def tearDown(self):
+        for session in self.sessions:
+            session.close()
+        shutil.rmtree(self.directory)
+
+    def last_used(self, session):
+        return dict(session.query(ojs.Sessions.session_id, ojs.Sessions.last_used))
+
+    def test_buffers_are_per_database(self):
+        one, two = self.sessions
+        self.assertEqual([self.activity.record(one, 's%d' % number, 10) for number in range(3)], [True, True, False])
+        self.assertTrue(self.activity.wakeup(logic._database_key(one)).is_set())
+        self.assertFalse(self.activity.wakeup(logic._database_key(two)).is_set())
+        self.assertTrue(self.activity.record(two, 's0', 10))
+
+        self.assertEqual(self.activity.flush(one), 2)
+        self.assertEqual(self.last_used(one), {'s0': 10, 's1': 10, 's2': 0})
+        self.assertEqual(self.activity.pending(logic._database_key(two)), 1)
+
+    def test_failed_flush_is_requeued(self):
+        one = self.sessions[0]
+        self.activity.record(one, 's0', 10, '10.0.0.1')
+        self.activity.record(one, 's1', 10)
+        original = logic.update_sessions_last_used
+
+        def fail(*args, **kwargs):
+            # a hit recorded while the write is in flight is merged with the failed batch.
+            self.activity.record(one, 's0', 20)
+            raise IOError('database went away')
+
+        logic.update_sessions_last_used = fail
+        try:
+            self.assertRaises(IOError, self.activity.flush, one)
+        finally:
+            logic.update_sessions_last_used = original
+        one.rollback()
+
+        self.assertEqual(self.activity.stats()['requeued'], 2)
+        self.assertEqual(self.activity.flush(one), 2)
+        self.assertEqual(self.last_used(one), {'s0': 20, 's1': 10, 's2': 0})
+        self.assertEqual(one.query(ojs.Sessions.ip_address).filter(ojs.Sessions.session_id == 's0').scalar(), '10.0.0.1')
@@ -0,0 +1,107 @@
+from ojssqla import ojs, logic
+from tests.support import LogicTestCase
+
+
+class WriteSettingsTests(LogicTestCase):
+    tables = ('article_settings', 'journal_settings', 'user_settings', 'users', 'roles', 'user_interests', 'controlled_vocab_entries')
+
+    def add_setting(self, settings_class, **columns):
+        columns.setdefault('setting_type', 'string')
+        self.session.add(settings_class(**columns))
+        self.session.commit()
+
+    def test_article_setting_overwrites_other_locale(self):
+        self.add_setting(ojs.ArticleSetting, article_id=1, locale='en_US', setting_name='title', setting_value='Old')
+        setting = logic.set_article_setting(self.session, {'article_id': 1}, 'title', 'New')
+        self.session.commit()
+
+        # a single row is updated where it is, keeping its locale.
+        self.assertEqual((setting.locale, setting.setting_value), ('en_US', 'New'))
+        rows = self.session.query(ojs.ArticleSetting).filter(ojs.ArticleSetting.article_id == 1).all()
+        self.assertEqual([(row.locale, row.setting_value) for row in rows], [('en_US', 'New')])
+        self.assertEqual(logic.resolve_settings(rows, ['en_US'])['title'], 'New')
+
+    def test_article_setting_keeps_other_locales(self):
+        self.add_setting(ojs.ArticleSetting, article_id=1, locale='en_US', setting_name='title', setting_value='English')
+        self.add_setting(ojs.ArticleSetting, article_id=1, locale='fr_CA', setting_name='title', setting_value='French')
+        logic.set_article_setting(self.session, {'article_id': 1}, 'title', 'New English', locale='en_US')
+        self.session.commit()
+
+        rows = self.session.query(ojs.ArticleSetting.locale, ojs.ArticleSetting.setting_value).order_by(ojs.ArticleSetting.locale).all()
+        self.assertEqual(rows, [('en_US', 'New English'), ('fr_CA', 'French')])
+
+    def test_missing_locale_is_added_next_to_several_others(self):
+        self.add_setting(ojs.JournalSetting, journal_id=1, locale='fr_CA', setting_name='title', setting_value='French title')
+        self.add_setting(ojs.JournalSetting, journal_id=1, locale='de_DE', setting_name='title', setting_value='German title')
+        setting = logic.update_or_create_journal_setting(self.session, 'title', 'English title', locale='en_US')
+        self.session.commit()
+
+        self.assertEqual((setting.locale, setting.setting_value), ('en_US', 'English title'))
+        rows = self.session.query(ojs.JournalSetting.locale, ojs.JournalSetting.setting_value).order_by(ojs.JournalSetting.locale).all()
+        self.assertEqual(rows, [('de_DE', 'German title'), ('en_US', 'English title'), ('fr_CA', 'French title')])
+
+    def test_journal_setting_overwrites_other_locale(self):
+        self.add_setting(ojs.JournalSetting, journal_id=1, locale='', setting_name='contactEmail', setting_value='a@x')
+        self.assertEqual(logic.non_localised_setting(self.session, 'contactEmail').setting_value, 'a@x')
+
+        logic.update_or_create_journal_setting(self.session, 'contactEmail', 'b@x')
+        self.session.commit()
+
+        self.assertEqual(self.session.query(ojs.JournalSetting).count(), 1)
+        self.assertEqual(logic.non_localised_setting(self.session, 'contactEmail').setting_value, 'b@x')
+
+    def test_missing_settings_are_inserted(self):
+        logic.set_article_settings(self.session, {1: {'title': 'A', 'abstract': 'B'}, 2: {'title': 'C'}})
+        self.session.commit()
+        rows = self.session.query(ojs.ArticleSetting.article_id, ojs.ArticleSetting.setting_name, ojs.ArticleSetting.setting_value)
+        self.assertEqual(sorted(rows), [(1, 'abstract', 'B'), (1, 'title', 'A'), (2, 'title', 'C')])
+
+
+class JournalSettingsCacheTests(LogicTestCase):
+    tables = ('journal_settings',)
+
+    def setUp(self):
+        super(JournalSettingsCacheTests, self).setUp()
+        self.session.add(ojs.JournalSetting(journal_id=1, locale='en_US', setting_name='title', setting_value='Old', setting_type='string'))
+        self.session.commit()
+
+    def title(self):
+        return logic.get_journal_setting(self.session, 'title', 'en_US').setting_value
+
+    def test_cache_is_invalidated_after_commit(self):
+        self.assertEqual(self.title(), 'Old')
+        logic.update_or_create_journal_setting(self.session, 'title', 'New')
+        # until the commit, readers keep getting the committed value.
+        self.assertEqual(self.title(), 'Old')
+        self.session.commit()
+        self.assertEqual(self.title(), 'New')
+
+    def test_rolled_back_value_is_not_kept(self):
+        logic.update_or_create_journal_setting(self.session, 'title', 'New')
+        # an entry loaded inside the transaction holds the uncommitted value.
+        logic.invalidate_journal_settings(self.session)
+        self.assertEqual(self.title(), 'New')
+        self.session.rollback()
+        self.assertEqual(self.title(), 'Old')
+
+    def test_unserialized_values_are_copies(self):
+        self.session.add(ojs.JournalSetting(journal_id=1, locale='en_US', setting_name='customAboutItems',
+                                            setting_value='a:1:{i:0;a:1:{s:5:"title";s:5:"About";}}', setting_type='object'))
+        self.session.commit()
+
+        items = logic.get_additional_policies(self.session, 'en_US')
+        items[0]['title'] = 'Changed'
+        items[1] = 'Added'
+        self.assertEqual(logic.get_additional_policies(self.session, 'en_US'), {0: {'title': 'About'}})
+
+    def test_cached_footer_settings_match_the_query(self):
+        self.session.add(ojs.JournalSetting(journal_id=1, locale='', setting_name='onlineIssn', setting_value='1234-5678', setting_type='string'))
+        self.session.add(ojs.JournalSetting(journal_id=2, locale='', setting_name='printIssn', setting_value='8765-4321', setting_type='string'))
+        self.session.commit()
+
+        settings = logic.get_footer_settings(self.session)
+        self.assertEqual(settings.count(), 1)
+        self.assertEqual([row.setting_value for row in logic.get_cached_footer_settings(self.session)],
+                         [row.setting_value for row in settings])
+        self.assertEqual([row.setting_value for row in logic.get_cached_contact_settings(self.session, ['title', 'printIssn'])],
+                         [row.setting_value for row in logic.contact_settings(self.session, ['title', 'printIssn'])])